@@ -0,0 +1,95 @@
+# notes
+'''
+Worker boot time and time to first byte, with the pages built eagerly and with LAZY_PAGES.
+Every run starts a fresh Python process (a new worker) and measures:
+- boot: `import app`, the packages, the pages, their components and callbacks (and, eagerly, the data);
+- first /: the first request, which also sets up the Dash index;
+- home: the complete load of the home page (layout, dependencies and its callbacks);
+- first chart page: the complete load of a page with charts, where the lazy worker loads the data;
+- max RSS of the process.
+'lazy + warm-up' starts app.start_warm_up right after the import, as the gunicorn workers do.
+The figure cache is a new temporary folder in every run, so the charts are computed.
+
+Run from the repository root, once the data files are in place:
+    python benchmarks/bench_boot.py --runs 3
+'''
+
+# package imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'src'))
+
+CONFIGURATIONS = {
+    'eager': {'LAZY_PAGES': ''},
+    'lazy': {'LAZY_PAGES': '1'},
+    'lazy + warm-up': {'LAZY_PAGES': '1', 'BENCH_WARM_UP': '1'},
+}
+COLUMNS = ['boot', 'first /', 'home', 'first chart page']
+
+
+def child(chart_page):
+    '''One worker: prints its measurements as JSON.'''
+    import resource
+    import tempfile
+    import time
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    start = time.perf_counter()
+    import app
+    timings = {'boot': time.perf_counter() - start}
+
+    # local imports
+    import cache
+    from cachelib import FileSystemCache
+    from bench_payload import PageLoad
+    cache.figure_cache = cache.TieredCache(
+        cache.MemoryLRU(cache.CACHE_MEMORY_ENTRIES, cache.CACHE_MEMORY_BYTES),
+        FileSystemCache(tempfile.mkdtemp(), threshold=0, default_timeout=0),
+    )
+    if os.environ.get('BENCH_WARM_UP'):
+        app.start_warm_up()
+
+    client = app.server.test_client()
+    start = time.perf_counter()
+    client.get('/')
+    timings['first /'] = time.perf_counter() - start
+    for name, path in [('home', '/'), ('first chart page', chart_page)]:
+        start = time.perf_counter()
+        PageLoad(client, path).run()
+        timings[name] = time.perf_counter() - start
+    timings['max RSS MB'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='workers started per configuration (the median is shown)')
+    parser.add_argument('--page', default='/trip_based/page_race', help='the page with charts')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.page)
+
+    print(f"{'configuration':<16}" + ''.join(f"{column + ' s':>19}" for column in COLUMNS) + f"{'max RSS MB':>12}")
+    for name, environment in CONFIGURATIONS.items():
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', '--page', args.page],
+                env={**os.environ, **environment, 'PYTHONPATH': BENCHMARKS_DIR},
+                capture_output=True, text=True, check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{name:<16}" + ''.join(f"{median[column]:>19.3f}" for column in COLUMNS) + f"{median['max RSS MB']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# notes
+'''
+Benchmark of the dropdown callbacks of the AIO components.
+Builds one PieChartAIO and one LineChartAIO per configuration on a synthetic survey, then replays
+a dropdown change for every filter combination through the Dash endpoint (Flask test client):
+- 'store': the previous flow, the dropdowns update a dcc.Store and a second callback draws the outputs;
+- 'single': one callback from the dropdowns to the outputs;
+- 'client': one callback from the dropdowns to the aggregates, drawn by a clientside callback (not replayed,
+  it runs in the browser).
+Each combination is replayed twice, first with an empty cache (cold) and then with the cache filled (warm).
+The benchmark uses its own figure cache in a temporary folder, so the cache of the app is left untouched.
+Reports the HTTP round trips, the server time and the response bytes per dropdown change.
+
+Run from the repository root:
+    python benchmarks/bench_callbacks.py
+'''
+
+# package imports
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy
+import pandas
+from cachelib import FileSystemCache
+from dash import Dash, html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# local imports
+import cache
+from utils.data_handling import PERSON_WEIGHT
+from components.pie_chart_AIO import PieChartAIO
+from components.line_chart_AIO import LineChartAIO
+
+LABELS = {
+    'RACE': {1: 'White', 2: 'Black', 3: 'Asian', 4: 'Other'},
+    'tripmode': {mode: f'Mode {mode}' for mode in range(1, 9)},
+}
+DROPDOWNS = {
+    'dpurp2': {'label': 'Purpose', 'options': [{'label': 'All', 'value': 'all'}] + [{'label': f'Purpose {value}', 'value': value} for value in range(1, 6)]},
+    'ocounty': {'label': 'County', 'options': [{'label': 'All', 'value': 'all'}] + [{'label': f'County {value}', 'value': value} for value in range(1, 7)]},
+}
+
+
+def make_survey(n_rows, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return pandas.DataFrame({
+        'dpurp2': rng.integers(1, 6, n_rows).astype(numpy.int8),
+        'ocounty': rng.integers(1, 7, n_rows).astype(numpy.int8),
+        'RACE': rng.integers(1, 5, n_rows).astype(numpy.int8),
+        'tripmode': rng.integers(1, 9, n_rows).astype(numpy.int8),
+        'travdist': rng.gamma(1.5, 4.0, n_rows).astype(numpy.float32),
+        PERSON_WEIGHT: rng.gamma(2.0, 50.0, n_rows).astype(numpy.float32),
+    })
+
+
+def build_app(df):
+    pie_pivot = {
+        'index': {'attribute': 'RACE', 'labels': LABELS['RACE']},
+        'column': {'attribute': 'tripmode', 'labels': LABELS['tripmode']},
+    }
+    line_pivot = {
+        'index': {'attribute': 'RACE', 'labels': LABELS['RACE']},
+        'column': {'attribute': 'travdist', 'labels': {}},
+    }
+    configurations = {
+        'store': {'callback_mode': 'store', 'render': 'server'},
+        'single': {'callback_mode': 'single', 'render': 'server'},
+        'client': {'callback_mode': 'single', 'render': 'client'},
+    }
+    charts = {
+        name: [
+            PieChartAIO(df, DROPDOWNS, pie_pivot, aio_id=f'bench-pie-{name}', **kwargs),
+            LineChartAIO(df, DROPDOWNS, line_pivot, aio_id=f'bench-line-{name}', **kwargs),
+        ]
+        for name, kwargs in configurations.items()
+    }
+    app = Dash(__name__)
+    app.layout = html.Div([chart for mode_charts in charts.values() for chart in mode_charts])
+    return app, charts
+
+
+def dash_id(component_id):
+    return json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+
+
+class Replayer:
+    '''Posts callback requests the way the browser does, following the store -> output chain.'''
+    def __init__(self, app):
+        self.client = app.server.test_client()
+        self.dependencies = [
+            dependency for dependency in json.loads(self.client.get('/_dash-dependencies').data)
+            if not dependency.get('clientside_function')  # runs in the browser
+        ]
+        self.requests = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def _post(self, dependency, values):
+        outputs = [
+            {'id': json.loads(output.rsplit('.', 1)[0]), 'property': output.rsplit('.', 1)[1]}
+            for output in dependency['output'].strip('.').split('...')
+        ]
+        payload = {
+            'output': dependency['output'],
+            'outputs': outputs if len(outputs) > 1 else outputs[0],
+            'inputs': [
+                {'id': json.loads(item['id']), 'property': item['property'], 'value': values[item['id']]}
+                for item in dependency['inputs']
+            ],
+            'changedPropIds': [f"{item['id']}.{item['property']}" for item in dependency['inputs']],
+            'state': [],
+        }
+        start = time.perf_counter()
+        response = self.client.post('/_dash-update-component', json=payload)
+        self.seconds += time.perf_counter() - start
+        self.requests += 1
+        self.bytes += len(response.data)
+        assert response.status_code == 200, response.data[:500]
+        return response.get_json()['response']
+
+    def change_dropdowns(self, chart, filters):
+        '''Replays one dropdown change of chart and every callback it triggers.'''
+        values = {dash_id(chart.ids_instance.generate(key, chart.aio_id)): value for key, value in filters.items()}
+        pending = [
+            dependency for dependency in self.dependencies
+            if any(item['id'] in values for item in dependency['inputs'])
+        ]
+        while pending:
+            dependency = pending.pop(0)
+            for component_id, props in self._post(dependency, values).items():
+                values[component_id] = props.get('data')  # a store feeds the next callback
+                pending += [
+                    dependency for dependency in self.dependencies
+                    if any(item['id'] == component_id for item in dependency['inputs'])
+                ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50_000, help='rows of the synthetic survey')
+    args = parser.parse_args()
+
+    cache.figure_cache = cache.TieredCache(
+        cache.MemoryLRU(cache.CACHE_MEMORY_ENTRIES, cache.CACHE_MEMORY_BYTES),
+        FileSystemCache(tempfile.mkdtemp(), threshold=0, default_timeout=0),
+    )
+    app, charts = build_app(make_survey(args.rows))
+    replayer = Replayer(app)
+
+    print(f"{'mode':>7} {'pass':>5} {'changes':>8} {'requests/change':>16} {'ms/change':>10} {'kB/change':>10}")
+    for mode, mode_charts in charts.items():
+        for label in ['cold', 'warm']:
+            replayer.requests, replayer.seconds, replayer.bytes, changes = 0, 0.0, 0, 0
+            for chart in mode_charts:
+                for filters in chart.filter_combinations():
+                    replayer.change_dropdowns(chart, filters)
+                    changes += 1
+            print(
+                f"{mode:>7} {label:>5} {changes:>8} {replayer.requests / changes:>16.1f} "
+                f"{replayer.seconds / changes * 1e3:>10.2f} {replayer.bytes / changes / 1e3:>10.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
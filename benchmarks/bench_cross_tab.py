@@ -0,0 +1,61 @@
+# notes
+'''
+Benchmark of the weighted cross-tabulation behind the mode share pie charts.
+Compares `utils.data_handling.cross_tab` (bincount kernel) with the previous pandas.pivot_table
+implementation on a synthetic survey at 1x, 10x and 100x the size of the trip survey.
+
+Run from the repository root:
+    python benchmarks/bench_cross_tab.py
+'''
+
+# package imports
+import argparse
+import os
+import sys
+import timeit
+import numpy
+import pandas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# local imports
+from utils.data_handling import cross_tab, PERSON_WEIGHT
+
+
+def pivot_table_cross_tab(df, var1, var2):
+    '''The previous implementation of cross_tab.'''
+    pivot_table = pandas.pivot_table(df, values=PERSON_WEIGHT, index=var1, columns=var2, aggfunc='sum', fill_value=0)
+    return pivot_table.sort_index(axis=0).sort_index(axis=1)
+
+
+def make_survey(n_rows, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return pandas.DataFrame({
+        'RACE': rng.integers(1, 5, n_rows).astype(numpy.int8),
+        'tripmode': rng.choice(numpy.array([1, 2, 3, 5, 6, 7, 8], dtype=numpy.int8), n_rows),
+        PERSON_WEIGHT: rng.gamma(2.0, 50.0, n_rows).astype(numpy.float32),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50_000, help='rows at 1x (about the size of the trip survey)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(f"{'scale':>6} {'rows':>10} {'pivot_table (ms)':>17} {'bincount (ms)':>14} {'speed-up':>9}")
+    for scale in args.scales:
+        df = make_survey(args.rows * scale)
+        expected = pivot_table_cross_tab(df, 'RACE', 'tripmode')
+        result = cross_tab(df, 'RACE', 'tripmode')
+        numpy.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-4)
+        assert list(result.index) == list(expected.index) and list(result.columns) == list(expected.columns)
+
+        repeat = max(1, 20 // scale)
+        old = min(timeit.repeat(lambda: pivot_table_cross_tab(df, 'RACE', 'tripmode'), number=repeat, repeat=3)) / repeat
+        new = min(timeit.repeat(lambda: cross_tab(df, 'RACE', 'tripmode'), number=repeat, repeat=3)) / repeat
+        print(f"{scale:>5}x {len(df):>10} {old * 1e3:>17.2f} {new * 1e3:>14.2f} {old / new:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# notes
+'''
+Benchmark of the /_dash-layout request, through the Flask test client.
+- 'rebuild': the previous behavior, the layout function builds the shell and Dash serializes it on every request
+  (replayed on a temporary route);
+- 'static': the pre-serialized shell served by app.serve_layout_json;
+- 'revalidate': the browser sends the ETag it has and gets 304 Not Modified.
+Each case is measured with and without Brotli.
+
+Run from the repository root, once the data files are in place:
+    python benchmarks/bench_layout.py
+'''
+
+# package imports
+import argparse
+import os
+import sys
+import timeit
+import warnings
+from flask import Response
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+warnings.filterwarnings('ignore')
+
+# local imports
+import app
+
+
+@app.server.route('/_bench-layout-rebuild')
+def rebuild_layout():
+    '''What Dash did with dash_app.layout = serve_layout (a function).'''
+    return Response(to_json_plotly(app.serve_layout()), mimetype='application/json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=200, help='requests per measurement')
+    args = parser.parse_args()
+
+    client = app.server.test_client()
+    etag = client.get('/_dash-layout').headers['ETag']
+    cases = {
+        'rebuild': ('/_bench-layout-rebuild', {}),
+        'static': ('/_dash-layout', {}),
+        'revalidate': ('/_dash-layout', {'If-None-Match': etag}),
+    }
+    print(f"{'case':>10} {'encoding':>9} {'status':>6} {'bytes':>7} {'ms/request':>11}")
+    for name, (url, headers) in cases.items():
+        for encoding in ['identity', 'br']:
+            request_headers = {**headers, 'Accept-Encoding': encoding}
+            response = client.get(url, headers=request_headers)
+            seconds = min(timeit.repeat(lambda: client.get(url, headers=request_headers), number=args.number, repeat=3))
+            print(f"{name:>10} {encoding:>9} {response.status_code:>6} {len(response.data):>7} {seconds / args.number * 1e3:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
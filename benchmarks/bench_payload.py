@@ -0,0 +1,181 @@
+# notes
+'''
+Bytes over the wire and an estimated time-to-interactive for every page of the app.
+Replays a page load through the Flask test client the way the browser does it:
+1. the html of the page,
+2. the scripts and stylesheets it links (served by the app, the CDN stylesheets are left out),
+3. /_dash-layout and /_dash-dependencies,
+4. the callbacks, round by round, until the page is complete (clientside callbacks run in the browser).
+Every request is made without compression and with Brotli, and the time-to-interactive is estimated with a simple
+network model: each round costs one round trip, the transfer of its bytes and the server time of its requests.
+On a repeat visit the scripts and stylesheets come from the browser cache (they are fingerprinted and immutable).
+
+Run from the repository root, once the data files are in place:
+    python benchmarks/bench_payload.py --rtt-ms 50 --mbps 10
+'''
+
+# package imports
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import warnings
+import dash
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+warnings.filterwarnings('ignore')
+
+# local imports
+import app as dash_app_module
+
+
+def component_key(component_id):
+    return component_id if isinstance(component_id, str) else json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+
+
+def collect_components(tree, components, path):
+    '''Adds every component of a layout (JSON) to components: id key -> props.'''
+    if isinstance(tree, list):
+        for item in tree:
+            collect_components(item, components, path)
+    elif isinstance(tree, dict):
+        if 'props' in tree and 'type' in tree:
+            props = dict(tree['props'])
+            if tree['type'] == 'Location':
+                props.update(pathname=path, search='')  # filled by the browser from the url
+            if props.get('id') is not None:
+                components.setdefault(component_key(props['id']), {}).update(props)
+            collect_components(props.get('children'), components, path)
+        else:
+            for value in tree.values():
+                collect_components(value, components, path)
+
+
+class PageLoad:
+    '''One page load: the requests of every round, with their sizes and server times.'''
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.rounds = []  # [(phase, [(url, raw bytes, br bytes, server seconds)])]
+
+    def request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        compressed = getattr(self.client, method)(url, headers={'Accept-Encoding': 'br'}, **kwargs)
+        elapsed = time.perf_counter() - start
+        raw = getattr(self.client, method)(url, headers={'Accept-Encoding': 'identity'}, **kwargs)
+        assert raw.status_code in (200, 204), (url, raw.status_code)
+        return raw, (url, len(raw.data), len(compressed.data), elapsed)
+
+    def run(self):
+        html, record = self.request('get', self.path)
+        self.rounds.append(('html', [record]))
+        links = re.findall(r'(?:src|href)="(/[^"]+)"', html.data.decode())
+        self.rounds.append(('static', [self.request('get', url)[1] for url in links]))
+
+        layout, layout_record = self.request('get', '/_dash-layout')
+        dependencies, dependencies_record = self.request('get', '/_dash-dependencies')
+        self.rounds.append(('layout', [layout_record, dependencies_record]))
+        dependencies = [dependency for dependency in dependencies.get_json() if not dependency.get('clientside_function')]
+
+        components = {}
+        collect_components(layout.get_json(), components, self.path)
+        fired = set()
+        while True:
+            pending_outputs = {
+                output for dependency in dependencies if dependency['output'] not in fired
+                for output in dependency['output'].strip('.').split('...')
+            }
+            runnable = [
+                dependency for dependency in dependencies
+                if dependency['output'] not in fired
+                and all(item['id'] in components for item in dependency['inputs'])
+                and not any(f"{item['id']}.{item['property']}" in pending_outputs for item in dependency['inputs'])
+            ]
+            if not runnable:
+                break
+            records = []
+            for dependency in runnable:
+                response, record = self.post_callback(dependency, components)
+                records.append(record)
+                fired.add(dependency['output'])
+                if response.status_code == 200:
+                    for component_id, props in response.get_json()['response'].items():
+                        components.setdefault(component_id, {}).update(props)
+                        collect_components(list(props.values()), components, self.path)
+            self.rounds.append(('callbacks', records))
+        return self
+
+    def post_callback(self, dependency, components):
+        outputs = [
+            {'id': self._parse_id(output.rsplit('.', 1)[0]), 'property': output.rsplit('.', 1)[1]}
+            for output in dependency['output'].strip('.').split('...')
+        ]
+        payload = {
+            'output': dependency['output'],
+            'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+            'inputs': [
+                {'id': self._parse_id(item['id']), 'property': item['property'],
+                 'value': components[item['id']].get(item['property'])}
+                for item in dependency['inputs']
+            ],
+            'state': [
+                {'id': self._parse_id(item['id']), 'property': item['property'],
+                 'value': components.get(item['id'], {}).get(item['property'])}
+                for item in dependency['state']
+            ],
+            'changedPropIds': [],
+        }
+        return self.request('post', '/_dash-update-component', json=payload)
+
+    @staticmethod
+    def _parse_id(component_id):
+        return json.loads(component_id) if component_id.startswith('{') else component_id
+
+    def estimate(self, rtt, bytes_per_second, compressed, repeat_visit=False):
+        '''Estimated time-to-interactive in seconds.'''
+        total = 0.0
+        for phase, records in self.rounds:
+            if repeat_visit and phase == 'static':
+                continue
+            size = sum(record[2] if compressed else record[1] for record in records)
+            total += rtt + size / bytes_per_second + sum(record[3] for record in records)
+        return total
+
+    def size(self, compressed, repeat_visit=False):
+        return sum(
+            record[2] if compressed else record[1]
+            for phase, records in self.rounds if not (repeat_visit and phase == 'static')
+            for record in records
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rtt-ms', type=float, default=50.0, help='round trip time of the network')
+    parser.add_argument('--mbps', type=float, default=10.0, help='bandwidth of the network, in megabits per second')
+    args = parser.parse_args()
+    rtt, bytes_per_second = args.rtt_ms / 1e3, args.mbps * 1e6 / 8
+
+    client = dash_app_module.server.test_client()
+    client.get('/')  # the first request builds the Dash index, keep it out of the numbers
+    print(f"network: {args.rtt_ms:.0f} ms round trip, {args.mbps:.0f} Mbit/s")
+    print(
+        f"{'page':<28} {'requests':>8} {'rounds':>6} {'raw kB':>8} {'br kB':>8} {'ratio':>6} "
+        f"{'TTI raw':>8} {'TTI br':>8} {'repeat kB':>9} {'TTI repeat':>10}"
+    )
+    for page in dash.page_registry.values():
+        load = PageLoad(client, page['path']).run()
+        requests = sum(len(records) for _, records in load.rounds)
+        raw, compressed = load.size(False), load.size(True)
+        print(
+            f"{page['path']:<28} {requests:>8} {len(load.rounds):>6} {raw / 1e3:>8.1f} {compressed / 1e3:>8.1f} "
+            f"{raw / compressed:>5.1f}x {load.estimate(rtt, bytes_per_second, False):>7.2f}s "
+            f"{load.estimate(rtt, bytes_per_second, True):>7.2f}s {load.size(True, repeat_visit=True) / 1e3:>9.1f} "
+            f"{load.estimate(rtt, bytes_per_second, True, repeat_visit=True):>9.2f}s"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -2,42 +2,58 @@
 '''
 This file is for housing the main dash application.
 This is where we define the various css items to fetch as well as the layout of our application.
+The layout (the shell around the pages: navbar, vertical navbars, page container and footer) is static,
+so it is built and serialized once, and /_dash-layout answers with the same bytes and a hash-based ETag.
+With LAZY_PAGES the pages only build their components and register their callbacks at import,
+the data is loaded on first use or by start_warm_up.
+Setting STARTUP_PROFILE to a file path traces the startup phases into a JSON report (see utils/profiling.py).
 '''
 
-# package imports
-import dash
-from dash import html, dcc
-import dash_bootstrap_components as dbc
-from flask import Flask
-from flask_login import LoginManager
-import os
-from dash import Input, Output, callback
-
-# local imports
-from utils.settings import APP_HOST, APP_PORT, APP_DEBUG, DEV_TOOLS_PROPS_CHECK, USE_RELOADER
-from components import navbar, footer, navbar_vertical_tour_page, navbar_vertical_trip_page
-
-from server import server
-
-# Initialize Dash app
-dash_app = dash.Dash(
-    __name__,
-    server=server,
-    use_pages=True,  # turn on Dash pages
-    external_stylesheets=[
-        dbc.themes.BOOTSTRAP,
-        dbc.icons.FONT_AWESOME
-    ],  # fetch the proper css items we want
-    meta_tags=[  # check if device is a mobile device. This is a must if you do any mobile styling
-        {
-            'name': 'viewport',
-            'content': 'width=device-width, initial-scale=1'
-        }
-    ],
-    suppress_callback_exceptions=True,
-    url_base_pathname="/",
-    title='Dash app structure'
-)
+# startup tracing (STARTUP_PROFILE) comes first, so that it covers the imports
+from utils.profiling import startup_profile
+
+with startup_profile.phase('imports'):
+    # package imports
+    import hashlib
+    import threading
+    import dash
+    from dash import html, dcc
+    import dash_bootstrap_components as dbc
+    from flask import Flask, Response
+    from flask_login import LoginManager
+    import os
+    from dash import Input, Output, callback
+    from plotly.io.json import to_json_plotly
+
+    # local imports
+    from utils.settings import APP_HOST, APP_PORT, APP_DEBUG, DEV_TOOLS_PROPS_CHECK, USE_RELOADER, LAZY_PAGES, LAZY_WARM_UP
+    from components import navbar, footer, navbar_vertical_tour_page, navbar_vertical_trip_page
+    from components.pie_chart_AIO import PieChartAIO
+    from components.line_chart_AIO import LineChartAIO
+
+    from server import server, set_cache_headers
+    from cache import start_sweeper
+
+# Initialize Dash app (it imports the pages, which build their components and register their callbacks)
+with startup_profile.phase('page import'):
+    dash_app = dash.Dash(
+        __name__,
+        server=server,
+        use_pages=True,  # turn on Dash pages
+        external_stylesheets=[
+            dbc.themes.BOOTSTRAP,
+            dbc.icons.FONT_AWESOME
+        ],  # fetch the proper css items we want
+        meta_tags=[  # check if device is a mobile device. This is a must if you do any mobile styling
+            {
+                'name': 'viewport',
+                'content': 'width=device-width, initial-scale=1'
+            }
+        ],
+        suppress_callback_exceptions=True,
+        url_base_pathname="/",
+        title='Dash app structure'
+    )
 
 
 def serve_layout():
@@ -75,7 +91,24 @@ def serve_layout():
 
 
 # set up the layout
-dash_app.layout = serve_layout  # set the layout to the serve_layout function
+dash_app.layout = serve_layout()  # nothing in the shell depends on the request, build it once
+
+# serialize it once as well
+layout_json = to_json_plotly(dash_app._layout_value()).encode('utf-8')
+layout_etag = hashlib.sha256(layout_json).hexdigest()[:16]
+
+def serve_layout_json():
+    '''Answers /_dash-layout with the pre-serialized layout, or 304 Not Modified when the browser has it.'''
+    response = Response(layout_json, mimetype='application/json')
+    response.set_etag(layout_etag)
+    return set_cache_headers(response, immutable=False)
+
+# NOTE: replaces the view Dash registered for /_dash-layout, which serializes the layout on every request.
+# Dash names the endpoint after the url, check it so that a Dash upgrade renaming it fails loudly.
+layout_endpoint = dash_app.config.routes_pathname_prefix + '_dash-layout'
+if layout_endpoint not in server.view_functions:
+    raise RuntimeError(f"Dash has no {layout_endpoint!r} view to replace, the layout would not be served pre-serialized")
+server.view_functions[layout_endpoint] = serve_layout_json
 
 # NOTE: It is a bit dirty. But, Flask server needs to have a route explicitly for the starting page (i.e., "/")
 @server.route("/")
@@ -104,9 +137,29 @@ def toggle_vertical_navbar(pathname):
         return "", {}, "", {}
 
 
+def warm_up():
+    '''Loads the data and builds the indexes and cubes of every chart (LAZY_PAGES defers it to their first use).'''
+    for chart in [*PieChartAIO.instances.values(), *LineChartAIO.instances.values()]:
+        chart.prepare()
+
+def start_warm_up():
+    '''
+    Runs warm_up in a background thread, so the worker answers requests while the data loads.
+    NOTE: start it after the fork (see gunicorn_config.post_fork), a forked worker does not inherit the thread.
+    '''
+    thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
 server = dash_app.server  # the server is needed to deploy the application
 
+startup_profile.finish()  # writes the startup report, when STARTUP_PROFILE is set
+
 if __name__ == "__main__":
+    start_sweeper()
+    if LAZY_PAGES and LAZY_WARM_UP:
+        start_warm_up()
 
     dash_app.run_server(
         host=APP_HOST,
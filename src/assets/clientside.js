@@ -0,0 +1,168 @@
+/*
+Clientside callbacks of the AIO components rendered with render='client' or render='cube'.
+With 'client' the server only sends the aggregates of the current filters. With 'cube' (PieChartAIO) the whole
+pre-aggregated cube is stored in the layout and the dropdown changes never reach the server.
+These functions build the same component tree and plotly figures as the server rendering, from the config
+stored once in the layout (labels, colors and the plotly template).
+*/
+(function () {
+    // PieChartAIO: one pie chart per row of a weighted cross-tabulation ({index, columns, values}), in a grid of two columns
+    function pieGrid(data, config) {
+        const columns = data.index.map(function (index, row) {
+            const figure = {
+                data: [{
+                    type: 'pie',
+                    labels: data.columns.map(function (column) { return config.column_labels[column]; }),
+                    values: data.values[row],
+                    textinfo: 'label+percent',
+                    insidetextorientation: 'horizontal',
+                    hole: 0.3,
+                    marker: {colors: config.colors}
+                }],
+                layout: {
+                    template: config.template,
+                    title: {text: String(config.index_labels[index]), font: {family: 'Arial', size: 24, color: 'black'}},
+                    margin: {t: 40, b: 40, l: 0, r: 40}
+                }
+            };
+            return {
+                namespace: 'dash_bootstrap_components',
+                type: 'Col',
+                props: {
+                    width: 6,
+                    children: {
+                        namespace: 'dash_html_components',
+                        type: 'Div',
+                        props: {
+                            style: {
+                                'padding': '10px',
+                                'border': '1px solid #ddd',
+                                'border-radius': '8px',
+                                'background-color': '#f9f9f9',
+                                'box-shadow': '0 4px 6px rgba(0, 0, 0, 0.1)'
+                            },
+                            children: {
+                                namespace: 'dash_core_components',
+                                type: 'Graph',
+                                props: {id: 'pie-chart-' + index, figure: figure}
+                            }
+                        }
+                    }
+                }
+            };
+        });
+        return {
+            namespace: 'dash_bootstrap_components',
+            type: 'Row',
+            props: {children: columns, justify: 'left', align: 'start', className: 'g-4'}
+        };
+    }
+
+    // Slices a WeightedCube (see WeightedCube.to_dict) with the filters and sums it into a var1 x var2 table,
+    // keeping the rows and columns with at least one record, as WeightedCube.cross_tab does on the server
+    function cubeCrossTab(cube, filters, var1, var2) {
+        const dimensions = cube.dimensions;
+        const shape = cube.levels.map(function (levels) { return levels.length; });
+        const allowed = dimensions.map(function (dimension, axis) {
+            const value = filters[dimension];
+            return cube.levels[axis].map(function (level) {
+                if (value === 'all' || !(dimension in filters)) {
+                    return true;
+                }
+                return Array.isArray(value) ? value.indexOf(level) >= 0 : value === level;
+            });
+        });
+        const rowAxis = dimensions.indexOf(var1);
+        const columnAxis = dimensions.indexOf(var2);
+        const weights = [];
+        const present = [];
+        for (let row = 0; row < shape[rowAxis]; row++) {
+            weights.push(new Array(shape[columnAxis]).fill(0));
+            present.push(new Array(shape[columnAxis]).fill(false));
+        }
+        const position = new Array(dimensions.length).fill(0);
+        for (let cell = 0; cell < cube.weights.length; cell++) {
+            // position holds the coordinates of the cell (row-major order, as numpy ravels the cube)
+            let remainder = cell;
+            let keep = true;
+            for (let axis = dimensions.length - 1; axis >= 0; axis--) {
+                position[axis] = remainder % shape[axis];
+                remainder = Math.floor(remainder / shape[axis]);
+                keep = keep && allowed[axis][position[axis]];
+            }
+            if (keep && cube.present[cell]) {
+                weights[position[rowAxis]][position[columnAxis]] += cube.weights[cell];
+                present[position[rowAxis]][position[columnAxis]] = true;
+            }
+        }
+        const rows = present.map(function (row) { return row.some(function (cell) { return cell; }); });
+        const columns = cube.levels[columnAxis].map(function (level, column) {
+            return present.some(function (row) { return row[column]; });
+        });
+        return {
+            index: cube.levels[rowAxis].filter(function (level, row) { return rows[row]; }),
+            columns: cube.levels[columnAxis].filter(function (level, column) { return columns[column]; }),
+            values: weights
+                .filter(function (row, i) { return rows[i]; })
+                .map(function (row) { return row.filter(function (weight, column) { return columns[column]; }); })
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        equity_dash: {
+            // PieChartAIO (render='client'): the server sends the cross-tabulation of the current filters
+            pie_charts: function (data, config) {
+                if (!data || !data.values) {
+                    return window.dash_clientside.no_update;
+                }
+                return pieGrid(data, config);
+            },
+
+            // PieChartAIO (render='cube'): the whole cube is in the layout, the dropdown values are the first arguments
+            cube_pie_charts: function () {
+                const values = Array.prototype.slice.call(arguments);
+                const config = values.pop();
+                const cube = values.pop();
+                const filters = {};
+                config.filters.forEach(function (dimension, i) { filters[dimension] = values[i]; });
+                return pieGrid(cubeCrossTab(cube, filters, config.index_name, config.column_name), config);
+            },
+
+            // LineChartAIO: one filled KDE curve per category
+            kde_graph: function (data, config) {
+                if (!data || !data.categories) {
+                    return window.dash_clientside.no_update;
+                }
+                const traces = data.categories.map(function (category, i) {
+                    const color = config.colors[(((category - 1) % config.colors.length) + config.colors.length) % config.colors.length];
+                    return {
+                        type: 'scatter',
+                        x: data.x[i],
+                        y: data.y[i],
+                        mode: 'lines',
+                        line: {width: 3.0, color: color},
+                        fill: 'tozeroy',
+                        fillcolor: color,
+                        name: String(config.index_labels[category])
+                    };
+                });
+                return {
+                    namespace: 'dash_core_components',
+                    type: 'Graph',
+                    props: {
+                        figure: {
+                            data: traces,
+                            layout: {
+                                template: config.template,
+                                title: {text: 'KDEs Distribution'},
+                                xaxis: {title: {text: config.xaxis_title}},
+                                yaxis: {title: {text: 'Density'}},
+                                margin: {l: 60, b: 40, t: 40, r: 0}
+                            }
+                        }
+                    }
+                };
+            }
+        }
+    });
+})();
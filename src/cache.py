@@ -2,20 +2,242 @@
 '''
 This file is for creating a Flask server to be used for the dash app.
 I also initiate the cache file here.
+
+The cache folder has one namespace (sub folder) per version of the datasets. Replacing a data file
+starts a fresh namespace, and a background thread (start_sweeper) deletes the namespaces of the older
+versions and keeps the current one under CACHE_MAX_BYTES.
+The memoized AIO outputs go through two tiers: an in-process LRU (per worker, no disk I/O) in front of
+the filesystem cache shared by all the workers. The outputs are cached as their JSON encoding (the
+filesystem tier holds the optionally compressed JSON bytes, the memory tier the decoded JSON value),
+so a hit neither unpickles a component tree nor rebuilds and validates plotly figures.
 '''
 # package imports
+import functools
+import json
+import logging
 import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import dash
+import plotly
+from flask import jsonify
 from flask_caching import Cache
+from plotly.io.json import to_json_plotly
 from server import server
 
+# local imports
+from utils import data_cube, data_handling
+from utils.cache_keys import code_version, make_cache_key
+from utils.data_loader import dataset_version, TRIP_DATA_PATH, TOUR_DATA_PATH
+from utils.settings import (
+    CACHE_MAX_BYTES, CACHE_SWEEP_INTERVAL, CACHE_MEMORY_ENTRIES, CACHE_MEMORY_BYTES, CACHE_COMPRESSION_LEVEL, CACHE_STATS
+)
+
+logger = logging.getLogger(__name__)
+
 # Configure FileSystemCache
-CACHE_DIR = os.path.join(os.getcwd(), 'cache')
+CACHE_ROOT = os.path.join(os.getcwd(), 'cache')
+CACHE_NAMESPACE = f'trip-{dataset_version(TRIP_DATA_PATH)}_tour-{dataset_version(TOUR_DATA_PATH)}'
+CACHE_DIR = os.path.join(CACHE_ROOT, CACHE_NAMESPACE)
 os.makedirs(CACHE_DIR, exist_ok=True)  # make if didn't exist
 CACHE_CONFIG = {
     'CACHE_TYPE': 'filesystem',
     'CACHE_DIR': CACHE_DIR,
-    #'CACHE_DEFAULT_TIMEOUT': 300, 
+    'CACHE_DEFAULT_TIMEOUT': 0,  # entries are invalidated by the dataset namespace, not by age
+    'CACHE_THRESHOLD': 0,  # the size is bounded by sweep_cache instead of an entry count
 }
 cache = Cache()
 cache.init_app(server, config=CACHE_CONFIG)
 
+
+def sweep_cache(root=CACHE_ROOT, current=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    '''
+    Deletes everything in the cache root except the current namespace, then deletes the oldest
+    entries of the current namespace until it fits in max_bytes.
+    '''
+    for entry in os.scandir(root):
+        if entry.path == current:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)  # namespace of an older dataset version
+        else:
+            try:
+                os.remove(entry.path)  # entry written before the cache had namespaces
+            except FileNotFoundError:
+                pass  # removed by another worker in the meantime
+
+    entries = []
+    for entry in os.scandir(current):
+        if entry.is_file() and not entry.name.startswith('__wz_cache_count'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # removed by another worker in the meantime
+        total_bytes -= size
+
+def _sweep_periodically():
+    while True:
+        try:
+            sweep_cache()
+        except OSError:
+            logger.exception("Cache sweep failed.")
+        time.sleep(CACHE_SWEEP_INTERVAL)
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+def start_sweeper():
+    '''
+    Starts the background thread that runs sweep_cache every CACHE_SWEEP_INTERVAL seconds, once per process.
+    NOTE: it is not started on import, so that the tests, the benchmarks and precompute.py do not sweep the cache.
+    The app starts it in each gunicorn worker after the fork (see gunicorn_config.post_fork) and in `python app.py`.
+    '''
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_periodically, name='cache-sweeper', daemon=True)
+            _sweeper.start()
+    return _sweeper
+
+
+class MemoryLRU:
+    '''
+    A thread-safe, in-process cache that keeps the most recently used entries, at most max_entries
+    and at most max_bytes (the sizes are given by the caller, None means no byte limit).
+    '''
+    def __init__(self, max_entries, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def set(self, key, value, size=0):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # larger than the whole tier, it stays in the shared tier only
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+
+def encode_payload(value):
+    '''Encodes an output (component tree, figure, plain data) as JSON bytes, compressed if CACHE_COMPRESSION_LEVEL > 0.'''
+    text = to_json_plotly(value).encode('utf-8')
+    if CACHE_COMPRESSION_LEVEL:
+        return b'z' + zlib.compress(text, CACHE_COMPRESSION_LEVEL)
+    return b'j' + text
+
+def _payload_text(payload):
+    return zlib.decompress(payload[1:]) if payload[:1] == b'z' else payload[1:]
+
+def decode_payload(payload):
+    '''Decodes the bytes made by encode_payload into the JSON value (dicts, lists, numbers, strings).'''
+    return json.loads(_payload_text(payload))
+
+
+class TieredCache:
+    '''
+    Looks up the in-process tier first, then the shared tier, and counts the hits and misses of each tier.
+    The shared tier stores encoded payloads, the in-process tier the decoded JSON values
+    (sized by the length of their JSON text).
+    '''
+    def __init__(self, memory, shared):
+        self.memory = memory
+        self.shared = shared
+        self.counters = {name: {'hits': 0, 'misses': 0} for name in ['memory', 'filesystem']}
+        self._lock = threading.Lock()  # the request threads of a worker share the counters
+
+    def _count(self, tier, hit):
+        with self._lock:
+            self.counters[tier]['hits' if hit else 'misses'] += 1
+
+    def _remember(self, key, payload):
+        '''Decodes a payload and keeps the value in the in-process tier.'''
+        text = _payload_text(payload)
+        value = json.loads(text)
+        self.memory.set(key, value, size=len(text))
+        return value
+
+    def get(self, key):
+        value = self.memory.get(key)
+        self._count('memory', value is not None)
+        if value is not None:
+            return value
+        payload = self.shared.get(key)
+        hit = isinstance(payload, bytes)  # anything else was written by an older version of the app
+        self._count('filesystem', hit)
+        if not hit:
+            return None
+        return self._remember(key, payload)
+
+    def set(self, key, value):
+        '''Stores value in both tiers and returns its JSON value, as get() would return it.'''
+        payload = encode_payload(value)
+        self.shared.set(key, payload)
+        return self._remember(key, payload)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counter) for name, counter in self.counters.items()}
+
+
+figure_cache = TieredCache(MemoryLRU(CACHE_MEMORY_ENTRIES, CACHE_MEMORY_BYTES), cache)
+
+if CACHE_STATS:
+    # NOTE: off by default, the counters and the worker pid are not for the public
+    @server.route('/_cache-stats')
+    def cache_stats():
+        '''Hit and miss counters of each cache tier, for the worker that answers the request.'''
+        return jsonify(pid=os.getpid(), **figure_cache.stats())
+
+
+@functools.lru_cache(maxsize=None)
+def component_code_version(component_class):
+    '''
+    The code version of the outputs of a component class: its module, the data handling modules
+    the outputs are computed with, and the plotly and dash versions that serialize them.
+    '''
+    paths = [sys.modules[component_class.__module__].__file__, data_handling.__file__, data_cube.__file__]
+    return code_version(paths, extra=[plotly.__version__, dash.__version__])
+
+def memoize_aio(method):
+    '''
+    Memoizes a method of an AIO component that takes the dropdown values (filters) as its only argument.
+    Unlike cache.memoize(), the key does not include repr(self): it is built from the component class,
+    its aio_id, the method name, the filters, the pivot spec, the dataset version of the component
+    and the code version of its class.
+    The wrapped method returns the JSON value of the output (components become dicts with
+    'type', 'namespace' and 'props'), which Dash sends to the browser as is.
+    '''
+    @functools.wraps(method)
+    def wrapper(self, filters):
+        key = make_cache_key(
+            self.__class__.__name__, self.aio_id, method.__name__, filters, self.pivot_spec, self.dataset_version,
+            component_code_version(self.__class__),
+        )
+        value = figure_cache.get(key)
+        if value is None:
+            value = figure_cache.set(key, method(self, filters))
+        return value
+    return wrapper
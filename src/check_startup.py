@@ -0,0 +1,61 @@
+# notes
+'''
+Startup budget check: imports the app in a fresh process with STARTUP_PROFILE set, prints the time and
+memory of each phase and exits with status 1 when a phase (or the whole startup) is over its budget.
+The budgets are in seconds, per phase name of the report (the sum of its runs), 'total' is the whole import.
+
+Run it from the repository root (the same folder the app is started from), once the data files are in place:
+    python src/check_startup.py --budget total=30 --budget get_trip_data=5 --report startup.json
+'''
+
+# package imports
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# local imports
+from utils.profiling import check_budgets
+
+
+def parse_budget(text):
+    name, _, seconds = text.rpartition('=')
+    if not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=SECONDS, got {text!r}")
+    return name, float(seconds)
+
+def profile_startup(report_path):
+    '''Imports the app in a new process and returns its startup report.'''
+    src = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run(
+        [sys.executable, '-c', 'import app'],
+        env={**os.environ, 'STARTUP_PROFILE': report_path, 'PYTHONPATH': src},
+        check=True,
+    )
+    with open(report_path) as report_file:
+        return json.load(report_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the startup time of the app against budgets.')
+    parser.add_argument('--budget', type=parse_budget, action='append', default=[], metavar='NAME=SECONDS',
+                        help="budget of a phase, or of the whole startup with 'total' (repeatable)")
+    parser.add_argument('--report', help='where to keep the JSON report (a temporary file by default)')
+    args = parser.parse_args()
+
+    report_path = args.report or os.path.join(tempfile.mkdtemp(), 'startup.json')
+    report = profile_startup(report_path)
+    print(f"{'phase':<28} {'runs':>5} {'seconds':>8} {'RSS delta MB':>13}")
+    for name, total in report['totals'].items():
+        print(f"{name:<28} {total['count']:>5} {total['seconds']:>8.3f} {total['rss_delta_mb']:>13.1f}")
+    print(f"{'total':<28} {'':>5} {report['total_seconds']:>8.3f} {report['rss_delta_mb']:>13.1f}")
+
+    exceeded = check_budgets(report, dict(args.budget))
+    for name, seconds, budget in exceeded:
+        print(f"over budget: {name} took {seconds:.3f} s, the budget is {budget:.3f} s")
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == '__main__':
+    main()
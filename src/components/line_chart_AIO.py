@@ -3,24 +3,50 @@
 This AIO creates a line chart card with two dropdowns for travel purpose, tour mode type (auto, transit, active), origin county, and a custom dropdown  as filters
 based on two different variables for pivoting.
 I did not use MATCH, created a class for making unique ids for each instance.
+By default (callback_mode='single') one callback goes from the dropdowns straight to the graph and the table.
+callback_mode='store' keeps the previous flow through a dcc.Store (two round trips per dropdown change).
+With render='client' the callback only returns the KDE curves (x and y arrays) to a dcc.Store, and a clientside
+callback (assets/clientside.js) draws the graph in the browser. The table of averages is still built on the server.
+df can be a function that loads the DataFrame (LAZY_PAGES), the data and the filter index then wait for their first use.
 
 For more information about AIO components, check out the official documentation:
 https://dash.plotly.com/all-in-one-components
 """
 
 # Package imports
-from dash import html, dcc, callback, Output, Input, State
+from dash import html, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State
 import dash_bootstrap_components as dbc
 import uuid
+import itertools
 import plotly.graph_objects as go
-from scipy.stats import gaussian_kde
+import plotly.io as pio
 import numpy
 
 # Local imports
-from utils.data_handling import filter_df, group_to_dict
-from cache import cache
+from utils.data_handling import filter_df, group_arrays, kde_bandwidth, exact_kde, binned_kde, round_significant, PERSON_WEIGHT
+from utils.filter_index import get_filter_index
+from utils.settings import AIO_RENDER
+from utils.profiling import startup_profile
+from utils.lazy import locked_cached_property
+from cache import memoize_aio
 
 class LineChartAIO(html.Div):
+    # aio_id -> instance of every chart built by the pages (used by precompute.py)
+    instances = {}
+
+    # high-contrast custom color palette, formatted with the opacity of the curves
+    color_palette = [
+        'rgba(31, 119, 180, {opacity})',  # Blue
+        'rgba(255, 127, 14, {opacity})',  # Orange
+        'rgba(44, 160, 44, {opacity})',   # Green
+        'rgba(214, 39, 40, {opacity})',   # Red
+        'rgba(148, 103, 189, {opacity})', # Purple
+        'rgba(140, 86, 75, {opacity})',   # Brown
+        'rgba(227, 119, 194, {opacity})', # Pink
+        'rgba(127, 127, 127, {opacity})', # Gray
+        'rgba(188, 189, 34, {opacity})',  # Olive
+        'rgba(23, 190, 207, {opacity})'   # Cyan
+    ]
 
     class ids:
         def __init__(self, parent_class_name):
@@ -33,18 +59,36 @@ class LineChartAIO(html.Div):
                 'aio_id': aio_id
             }
 
-    def __init__(self, df, dropdowns, pivot_elements, kind='Distance', activity_type='Travel', aio_id=None):
+    @startup_profile.timed('LineChartAIO construction')
+    def __init__(self, df, dropdowns, pivot_elements, kind='Distance', activity_type='Travel', aio_id=None,
+                 callback_mode='single', render=AIO_RENDER):
         if aio_id is None:
             aio_id = str(uuid.uuid4())
+        if callback_mode not in ('single', 'store'):
+            raise ValueError(f"callback_mode must be 'single' or 'store', got {callback_mode!r}")
+        if render not in ('server', 'client'):
+            raise ValueError(f"render must be 'server' or 'client', got {render!r}")
+        if render == 'client' and callback_mode != 'single':
+            raise ValueError("render='client' requires callback_mode='single'")
 
         self.aio_id = aio_id
+        LineChartAIO.instances[aio_id] = self
         self.activity_type = activity_type
-        self.df = df
+        self.callback_mode = callback_mode
+        self.render = render
+        # a DataFrame, or a function that loads it (LAZY_PAGES): the data and the index are then
+        # loaded and built on first use (see prepare) instead of when the page is imported
+        self.load_df = df if callable(df) else (lambda: df)
+        self.lazy = callable(df)
         self.dropdowns = dropdowns
         self.index_name = pivot_elements['index']['attribute']
         self.index_labels = pivot_elements['index']['labels']
         self.column_name = pivot_elements['column']['attribute']
         self.column_labels = pivot_elements['column']['labels']
+        # part of the cache keys of the memoized outputs
+        self.pivot_spec = {'index': self.index_name, 'column': self.column_name}
+        if not self.lazy:
+            self.prepare()
         self.kind = kind
         # unit mapping
         unit_mapping = {
@@ -60,6 +104,9 @@ class LineChartAIO(html.Div):
         self.store_id = self.ids_instance.generate('store', self.aio_id)
         self.output_histogram_id = self.ids_instance.generate('output_histogram', self.aio_id)
         self.output_table_id = self.ids_instance.generate('output_table', self.aio_id)
+        # client rendering: KDE curves of the current filters, and what the browser needs to draw them
+        self.data_id = self.ids_instance.generate('data', self.aio_id)
+        self.config_id = self.ids_instance.generate('config', self.aio_id)
 
         # Style dictionary
         component_style = {
@@ -108,7 +155,8 @@ class LineChartAIO(html.Div):
                             style={'height': '100vh', 'padding': '10px'}
                         )
                     ),
-                    dcc.Store(self.store_id, data=[])
+                    *([dcc.Store(self.store_id, data=[])] if self.callback_mode == 'store' else []),  # read by the second callback only
+                    *(self.client_stores() if self.render == 'client' else []),
                 ],
                 style=component_style,
                 className="container-fluid",
@@ -119,6 +167,42 @@ class LineChartAIO(html.Div):
         # register the callbacks here
         self.register_callbacks()
 
+    @locked_cached_property
+    def df(self):
+        return self.load_df()
+
+    @locked_cached_property
+    def filter_index(self):
+        # shared bitmap index over the dropdown columns, built once per dataset
+        filter_index = get_filter_index(self.df)
+        filter_index.add_columns(self.dropdowns.keys())
+        return filter_index
+
+    @locked_cached_property
+    def dataset_version(self):
+        # part of the cache keys of the memoized outputs, a lazy loader knows it without loading the data
+        return getattr(self.load_df, 'dataset_version', None) or self.df.attrs.get('dataset_version')
+
+    def prepare(self):
+        '''Loads the data and builds the index, if it was not done yet.'''
+        return self.filter_index, self.dataset_version
+
+    def client_stores(self):
+        '''The stores read by the clientside callback: the KDE curves and the static drawing config.'''
+        config = {
+            'index_labels': self.index_labels,
+            'colors': [color.format(opacity=0.5) for color in self.color_palette],
+            'xaxis_title': f"{self.kind} {self.unit}",
+            'template': pio.templates[pio.templates.default].to_plotly_json(),
+        }
+        return [dcc.Store(id=self.data_id), dcc.Store(id=self.config_id, data=config)]
+
+    def filter_combinations(self):
+        '''Every combination of the dropdown values, as filters dictionaries.'''
+        keys = list(self.dropdowns.keys())
+        values = [[option['value'] for option in self.dropdowns[key]['options']] for key in keys]
+        return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
     def generate_dropdowns(self, dropdown_dict):
         return [
             dbc.Row(
@@ -144,38 +228,35 @@ class LineChartAIO(html.Div):
         filters_copy = {
             key: value for key, value in filters.items() if value != 'all'
         }  # Remove all 'all' keys to not filter on them    
-        filtered_df = filter_df(self.df, filters_copy)[[var1, var2]]
-        return group_to_dict(filtered_df, var1, var2)
+        filtered_df = filter_df(self.df, filters_copy, columns=[var1, var2, PERSON_WEIGHT], index=self.filter_index)
+        # {category: (values, person weights)}, kept as numpy arrays
+        groups = group_arrays(
+            filtered_df[var1].to_numpy(),
+            filtered_df[var2].to_numpy(),
+            filtered_df[PERSON_WEIGHT].to_numpy()
+        )
+        # a category whose records all weigh 0 has no weighted average nor density
+        return {category: group for category, group in groups.items() if numpy.sum(group[1]) > 0}
 
-    def creat_kde_xy(self, dict, bw_method='silverman', bw_adjust=0.3, bin_number=200):
+    def creat_kde_xy(self, dict, bw_method='silverman', bw_adjust=0.3, bin_number=200, method='binned'):
         kde_dict = {}
-        for key, numbers in dict.items():
-            numbers = numpy.array(numbers)
-            kde = gaussian_kde(numbers, bw_method=bw_method)
-            kde.set_bandwidth(bw_method=kde.factor * bw_adjust)  # adjust the factor
-            x_kde = numpy.linspace(min(numbers), max(numbers), bin_number)
-            y_kde = kde(x_kde)
+        for key, (numbers, weights) in dict.items():
+            numbers = numpy.asarray(numbers, dtype=float)
+            x_kde = numpy.linspace(numbers.min(), numbers.max(), bin_number)
+            bandwidth = kde_bandwidth(numbers, weights, bw_method=bw_method, bw_adjust=bw_adjust)
+            if method == 'exact':
+                # sum of the kernels of every sample, as scipy.stats.gaussian_kde
+                y_kde = exact_kde(numbers, bandwidth, x_kde, weights)
+            else:
+                # binned FFT estimate, the cost barely depends on the number of samples
+                y_kde = binned_kde(numbers, bandwidth, x_kde, weights)
             kde_dict[key] = (x_kde, y_kde)
         return kde_dict
 
     def create_kde_graph(self, kde_dict, opacity=0.5):
-        # Define a high-contrast custom color palette
-        color_palette = [
-            'rgba(31, 119, 180, {opacity})',  # Blue
-            'rgba(255, 127, 14, {opacity})',  # Orange
-            'rgba(44, 160, 44, {opacity})',   # Green
-            'rgba(214, 39, 40, {opacity})',   # Red
-            'rgba(148, 103, 189, {opacity})', # Purple
-            'rgba(140, 86, 75, {opacity})',   # Brown
-            'rgba(227, 119, 194, {opacity})', # Pink
-            'rgba(127, 127, 127, {opacity})', # Gray
-            'rgba(188, 189, 34, {opacity})',  # Olive
-            'rgba(23, 190, 207, {opacity})'   # Cyan
-        ]
-
         # Assign colors dynamically while ensuring a loop if there are more categories than colors
         category_to_color = {
-            i: color_palette[(i-1) % len(color_palette)].format(opacity=opacity)
+            i: self.color_palette[(i-1) % len(self.color_palette)].format(opacity=opacity)
             for i in kde_dict
         }
 
@@ -212,7 +293,7 @@ class LineChartAIO(html.Div):
             html.Tr(
                 [
                     html.Td(f"{self.index_labels[category]}"),
-                    html.Td(f"{numpy.mean(dict[category]):.2f} {self.unit}")
+                    html.Td(f"{numpy.average(dict[category][0], weights=dict[category][1]):.2f} {self.unit}")
                 ]
             )
             for category in dict
@@ -245,18 +326,61 @@ class LineChartAIO(html.Div):
 
 
 
-    # final function to make the line graph
-    @cache.memoize()
-    def make_line_graph(self, dict, var1, var2, _id):
-        dict = self.data_processing(dict, var1, var2)
-        return self.create_kde_graph(self.creat_kde_xy(dict))
+    # final function to make the line graph and the table
+    @memoize_aio
+    def make_distribution(self, filters):
+        '''The KDE graph and the table of averages, from one pass of filtering and grouping, cached as one entry.'''
+        dict = self.data_processing(filters, self.index_name, self.column_name)
+        return self.create_kde_graph(self.creat_kde_xy(dict)), self.create_average_table(dict)
+
+    @memoize_aio
+    def make_distribution_data(self, filters):
+        '''The KDE curves as plain lists, drawn by the clientside callback, and the table of averages.'''
+        dict = self.data_processing(filters, self.index_name, self.column_name)
+        kde_dict = self.creat_kde_xy(dict)
+        data = {
+            'categories': list(kde_dict),
+            'x': [round_significant(x, 6) for x, _ in kde_dict.values()],
+            'y': [round_significant(y, 6) for _, y in kde_dict.values()],
+        }
+        return data, self.create_average_table(dict)
 
-    @cache.memoize()
-    def make_table(self, dict, var1, var2, _id):
-        dict = self.data_processing(dict, var1, var2)
-        return self.create_average_table(dict)
+    def warm_cache(self, filters):
+        '''Computes and caches the outputs for the given dropdown values.'''
+        if self.render == 'client':
+            self.make_distribution_data(filters)
+        else:
+            self.make_distribution(filters)
 
+    @startup_profile.timed('callback registration')
     def register_callbacks(self):
+        if self.render == 'client':
+            @callback(
+                Output(self.data_id, 'data'),
+                Output(self.output_table_id, 'children'),
+                [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()]
+            )
+            def update_data(*values):
+                return self.make_distribution_data(dict(zip(self.dropdowns.keys(), values)))
+
+            clientside_callback(
+                ClientsideFunction(namespace='equity_dash', function_name='kde_graph'),
+                Output(self.output_histogram_id, 'children'),
+                Input(self.data_id, 'data'),
+                State(self.config_id, 'data'),
+            )
+            return
+
+        if self.callback_mode == 'single':
+            @callback(
+                Output(self.output_histogram_id, 'children'),
+                Output(self.output_table_id, 'children'),
+                [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()]
+            )
+            def update_graph(*values):
+                return self.make_distribution(dict(zip(self.dropdowns.keys(), values)))
+            return
+
         @callback(
             Output(self.store_id, 'data'),
             [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()]
@@ -268,8 +392,7 @@ class LineChartAIO(html.Div):
                 'row_name': self.index_name,
                 'column_name': self.column_name,
             }
-            self.make_line_graph(state_data['filters'], state_data['row_name'], state_data['column_name'], self.aio_id)
-            self.make_table(state_data['filters'], state_data['row_name'], state_data['column_name'], self.aio_id)
+            self.make_distribution(state_data['filters'])
             return state_data
 
         @callback(
@@ -278,7 +401,4 @@ class LineChartAIO(html.Div):
             Input(self.store_id, 'data')
         )
         def update_graph(data):
-            return (
-                self.make_line_graph(data['filters'], data['row_name'], data['column_name'], self.aio_id), 
-                self.make_table(data['filters'], data['row_name'], data['column_name'], self.aio_id)
-            )
\ No newline at end of file
+            return self.make_distribution(data['filters'])
\ No newline at end of file
@@ -10,7 +10,7 @@ from dash import html, callback, Output, Input, dcc, State
 import dash_bootstrap_components as dbc
 
 # local imports
-from utils.images import logo_encoded, logo_encoded_equity_dash
+from utils.images import logo_url, logo_url_equity_dash
 
 # Navbar component
 navbar = dbc.Navbar(
@@ -19,7 +19,7 @@ navbar = dbc.Navbar(
             html.A(
                 dbc.Row(
                     [
-                        dbc.Col(html.Img(src=logo_encoded, height="65px")),
+                        dbc.Col(html.Img(src=logo_url, height="65px")),
                     ],
                     align="center",
                     className="g-0",
@@ -33,7 +33,7 @@ navbar = dbc.Navbar(
             html.A(
                 dbc.Row(
                     [
-                        dbc.Col(html.Img(src=logo_encoded_equity_dash, height="160px")),
+                        dbc.Col(html.Img(src=logo_url_equity_dash, height="160px")),
                     ],
                     align="center",
                     className="g-0",
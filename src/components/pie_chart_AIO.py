@@ -5,24 +5,57 @@ which act as filters for the data, enabling pivoting based on two distinct varia
 - The number of pie charts created corresponds to the number of entries in the index variable, 
 and the number of categories in each chart matches the length of the column list.
 - A custom class was implemented to generate unique IDs for each instance, replacing the use of MATCH.
+- By default (callback_mode='single') one callback goes from the dropdowns straight to the charts.
+callback_mode='store' keeps the previous flow, where a first callback writes the filters to a dcc.Store
+and a second one draws the charts from the store (two round trips per dropdown change).
+- With render='client' the callback only returns the weighted cross-tabulation (a few numbers per chart)
+to a dcc.Store, and a clientside callback (assets/clientside.js) draws the pie charts in the browser
+from the labels, colors and plotly template stored once in the layout.
+- With render='cube' the whole weighted cube (every dropdown and pivot dimension, a few thousand numbers)
+is stored in the layout, and the dropdowns drive a clientside callback that slices it: the charts are
+drawn without any request to the server.
+- df can be a function that loads the DataFrame (LAZY_PAGES). The page then only builds the components and
+registers the callbacks, and the data and the cube wait for their first use.
 
 For more information about AIO components, check out the official documentation:
 https://dash.plotly.com/all-in-one-components
 '''
 
 # Package imports
-from dash import html, dcc, callback, Output, Input, State
+from dash import html, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State
 import dash_bootstrap_components as dbc
 import uuid
+import itertools
 import plotly.graph_objects as go
+import plotly.io as pio
 
 # Local imports
 from utils.data_loader import get_tour_data
-from utils.data_handling import filter_df, cross_tab
-from cache import cache
+from utils.data_handling import filter_df, cross_tab, round_significant, PERSON_WEIGHT
+from utils.filter_index import get_filter_index
+from utils.data_cube import WeightedCube
+from utils.settings import AIO_RENDER
+from utils.profiling import startup_profile
+from utils.lazy import locked_cached_property
+from cache import memoize_aio
+
+
+class LazyStore(dcc.Store):
+    '''A dcc.Store whose data is computed when the layout is serialized for the first time (the first visit of the page).'''
+    def __init__(self, get_data, **kwargs):
+        super().__init__(**kwargs)
+        self.get_data = get_data
+
+    def to_plotly_json(self):
+        if getattr(self, 'data', None) is None:
+            self.data = self.get_data()
+        return super().to_plotly_json()
 
 
 class PieChartAIO(html.Div):
+    # aio_id -> instance of every chart built by the pages (used by precompute.py)
+    instances = {}
+
     class ids:
         def __init__(self, parent_class_name):
             self.parent_class_name = parent_class_name
@@ -34,25 +67,45 @@ class PieChartAIO(html.Div):
                 'aio_id': aio_id
             }
 
-    def __init__(self, df, dropdowns, pivot_elements, activity_type='Travel', aio_id=None):
+    @startup_profile.timed('PieChartAIO construction')
+    def __init__(self, df, dropdowns, pivot_elements, activity_type='Travel', aio_id=None, callback_mode='single',
+                 render=AIO_RENDER):
         if aio_id is None:
             aio_id = str(uuid.uuid4())
+        if callback_mode not in ('single', 'store'):
+            raise ValueError(f"callback_mode must be 'single' or 'store', got {callback_mode!r}")
+        if render not in ('server', 'client', 'cube'):
+            raise ValueError(f"render must be 'server', 'client' or 'cube', got {render!r}")
+        if render != 'server' and callback_mode != 'single':
+            raise ValueError(f"render={render!r} requires callback_mode='single'")
 
         self.aio_id = aio_id
+        PieChartAIO.instances[aio_id] = self
         self.activity_type = activity_type
-        self.df = df
+        self.callback_mode = callback_mode
+        self.render = render
+        # a DataFrame, or a function that loads it (LAZY_PAGES): the data and the cube are then
+        # loaded and built on first use (see prepare) instead of when the page is imported
+        self.load_df = df if callable(df) else (lambda: df)
+        self.lazy = callable(df)
         self.dropdowns = dropdowns
         self.index_name = pivot_elements['index']['attribute']
         self.index_labels = pivot_elements['index']['labels']
         self.column_name = pivot_elements['column']['attribute']
         self.column_labels = pivot_elements['column']['labels']
-        
+        # part of the cache keys of the memoized outputs
+        self.pivot_spec = {'index': self.index_name, 'column': self.column_name}
+        if not self.lazy:
+            self.prepare()
 
         # initiate the id generator
         self.ids_instance = PieChartAIO.ids(self.__class__.__name__)
         # initiate id for the store and output in the front end html
         self.store_id = self.ids_instance.generate('store', self.aio_id)
         self.output_id = self.ids_instance.generate('output', self.aio_id)
+        # client rendering: aggregates of the current filters, and what the browser needs to draw them
+        self.data_id = self.ids_instance.generate('data', self.aio_id)
+        self.config_id = self.ids_instance.generate('config', self.aio_id)
 
         self.component_style = {
             "font-family": "Arial, sans-serif",
@@ -92,7 +145,8 @@ class PieChartAIO(html.Div):
                         justify='center',
                         align='start',
                     ),
-                    dcc.Store(id=self.store_id, data=[])
+                    *([dcc.Store(id=self.store_id, data=[])] if self.callback_mode == 'store' else []),  # read by the second callback only
+                    *(self.client_stores() if self.render != 'server' else []),
                 ],
                 style=self.component_style,
                 className="container-fluid",
@@ -101,6 +155,58 @@ class PieChartAIO(html.Div):
 
         self.register_callbacks()
 
+    @locked_cached_property
+    def df(self):
+        return self.load_df()
+
+    @locked_cached_property
+    def filter_index(self):
+        # shared bitmap index over the dropdown columns, built once per dataset
+        # NOTE: only used when the cube does not cover the filters, so it is not built by prepare
+        filter_index = get_filter_index(self.df)
+        filter_index.add_columns(self.dropdowns.keys())
+        return filter_index
+
+    @locked_cached_property
+    def cube(self):
+        # weighted counts over every dropdown and pivot dimension
+        return WeightedCube(self.df, [*self.dropdowns.keys(), self.index_name, self.column_name])
+
+    @locked_cached_property
+    def dataset_version(self):
+        # part of the cache keys of the memoized outputs, a lazy loader knows it without loading the data
+        return getattr(self.load_df, 'dataset_version', None) or self.df.attrs.get('dataset_version')
+
+    def prepare(self):
+        '''Loads the data and builds the cube, if it was not done yet.'''
+        return self.cube, self.dataset_version
+
+    def client_stores(self):
+        '''
+        The stores read by the clientside callback: the aggregates (filled by the server callback,
+        or the whole cube with render='cube') and the static drawing config.
+        '''
+        config = {
+            'index_labels': self.index_labels,
+            'column_labels': self.column_labels,
+            'colors': self.color_palette[:len(self.column_labels)],
+            'template': pio.templates[pio.templates.default].to_plotly_json(),
+            'filters': list(self.dropdowns.keys()),
+            'index_name': self.index_name,
+            'column_name': self.column_name,
+        }
+        if self.render == 'cube':
+            data_store = LazyStore(lambda: self.cube.to_dict(), id=self.data_id)
+        else:
+            data_store = dcc.Store(id=self.data_id)
+        return [data_store, dcc.Store(id=self.config_id, data=config)]
+
+    def filter_combinations(self):
+        '''Every combination of the dropdown values, as filters dictionaries.'''
+        keys = list(self.dropdowns.keys())
+        values = [[option['value'] for option in self.dropdowns[key]['options']] for key in keys]
+        return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
     def generate_dropdowns(self, dropdown_dict):
         return [
             dbc.Row(
@@ -175,15 +281,73 @@ class PieChartAIO(html.Div):
         return pie_chart
 
     def global_store(self, filters, var1, var2):
-        filtered_data = filter_df(self.df, {k: v for k, v in filters.items() if v != 'all'})
+        conditions = {k: v for k, v in filters.items() if v != 'all'}
+        if self.cube.covers(conditions, var1, var2):
+            return self.cube.cross_tab(conditions, var1, var2)
+        filtered_data = filter_df(self.df, conditions, columns=[var1, var2, PERSON_WEIGHT], index=self.filter_index)
         return cross_tab(filtered_data, var1, var2)
 
-    @cache.memoize()
-    def make_pie_charts(self, data, _id):
-        table = self.global_store(data['filters'], data['row_name'], data['column_name'])
+    @memoize_aio
+    def make_pie_charts(self, filters):
+        table = self.global_store(filters, self.index_name, self.column_name)
         return self.pie_charts_grid(self.create_pie_charts(table))
 
+    @memoize_aio
+    def make_pie_data(self, filters):
+        '''The weighted cross-tabulation as plain lists, drawn by the clientside callback.'''
+        table = self.global_store(filters, self.index_name, self.column_name)
+        return {
+            'index': table.index.tolist(),
+            'columns': table.columns.tolist(),
+            'values': [round_significant(row, 6) for row in table.to_numpy()],
+        }
+
+    def warm_cache(self, filters):
+        '''Computes and caches the outputs for the given dropdown values (nothing to cache with render='cube').'''
+        if self.render == 'cube':
+            return
+        if self.render == 'client':
+            self.make_pie_data(filters)
+        else:
+            self.make_pie_charts(filters)
+
+    @startup_profile.timed('callback registration')
     def register_callbacks(self):
+        if self.render == 'cube':
+            clientside_callback(
+                ClientsideFunction(namespace='equity_dash', function_name='cube_pie_charts'),
+                Output(self.output_id, 'children'),
+                [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()],
+                State(self.data_id, 'data'),
+                State(self.config_id, 'data'),
+            )
+            return
+
+        if self.render == 'client':
+            @callback(
+                Output(self.data_id, 'data'),
+                [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()]
+            )
+            def update_data(*values):
+                return self.make_pie_data(dict(zip(self.dropdowns.keys(), values)))
+
+            clientside_callback(
+                ClientsideFunction(namespace='equity_dash', function_name='pie_charts'),
+                Output(self.output_id, 'children'),
+                Input(self.data_id, 'data'),
+                State(self.config_id, 'data'),
+            )
+            return
+
+        if self.callback_mode == 'single':
+            @callback(
+                Output(self.output_id, 'children'),
+                [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()]
+            )
+            def update_graph(*values):
+                return self.make_pie_charts(dict(zip(self.dropdowns.keys(), values)))
+            return
+
         @callback(
             Output(self.store_id, 'data'),
             [Input(self.ids_instance.generate(key, self.aio_id), 'value') for key in self.dropdowns.keys()]
@@ -195,7 +359,7 @@ class PieChartAIO(html.Div):
                 'row_name': self.index_name,
                 'column_name': self.column_name,
             }
-            self.make_pie_charts(state_data, self.aio_id)
+            self.make_pie_charts(state_data['filters'])
             return state_data
 
         @callback(
@@ -203,4 +367,4 @@ class PieChartAIO(html.Div):
             Input(self.store_id, 'data')
         )
         def update_graph(data):
-            return self.make_pie_charts(data, self.aio_id)
+            return self.make_pie_charts(data['filters'])
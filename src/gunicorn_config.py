@@ -1,2 +1,30 @@
-bind = '0.0.0.0:8085'
-workers = 2
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8085)}"  # Heroku sets PORT, the Docker image exposes 8085
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Import the app in the master before forking the workers. Both datasets are loaded once, the
+# workers inherit them copy-on-write and the memory-mapped columns stay shared through the page cache,
+# so adding workers does not multiply the memory used by the data.
+# With LAZY_PAGES the master only builds the components, and each worker loads the data after the fork.
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded. Freezing the objects created so far keeps the
+    # workers' garbage collector from writing to (and therefore copying) the inherited pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The background threads start in each worker: a thread running in the master would not be
+    # inherited by the workers, and forking while it holds a lock is unsafe.
+    import app
+    import cache
+    from utils.settings import LAZY_PAGES, LAZY_WARM_UP
+    cache.start_sweeper()
+    # With LAZY_PAGES, each worker loads the data in a background thread as soon as it starts,
+    # rather than in the first request of a page.
+    if LAZY_PAGES and LAZY_WARM_UP:
+        app.start_warm_up()
@@ -3,9 +3,10 @@
 This file is for creating loading the tour dataframe to prevent re-load it for each page.
 '''
 # local imports
-from utils.data_loader import get_tour_data
+from utils.data_loader import get_tour_data, lazy_loader, TOUR_DATA_PATH
+from utils.settings import LAZY_PAGES
 
-# load the processed tour file
-tour_df = get_tour_data()
+# load the processed tour file, or with LAZY_PAGES a function that loads it on the first call (the charts accept both)
+tour_df = lazy_loader(get_tour_data, TOUR_DATA_PATH) if LAZY_PAGES else get_tour_data()
 
 
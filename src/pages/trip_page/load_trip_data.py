@@ -3,9 +3,10 @@
 This file is for creating loading the tour dataframe to prevent re-load it for each page.
 '''
 # local imports
-from utils.data_loader import get_trip_data
+from utils.data_loader import get_trip_data, lazy_loader, TRIP_DATA_PATH
+from utils.settings import LAZY_PAGES
 
-# load the processed trip file
-trip_df = get_trip_data()
+# load the processed trip file, or with LAZY_PAGES a function that loads it on the first call (the charts accept both)
+trip_df = lazy_loader(get_trip_data, TRIP_DATA_PATH) if LAZY_PAGES else get_trip_data()
 
 
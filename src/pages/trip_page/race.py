@@ -172,7 +172,8 @@ layout = dbc.Container(
                     dropdowns=dropdowns_pie_charts,
                     pivot_elements=pivots_pie_charts, # pivot table index and columns
                     activity_type='Trip', # default is 'Travel'
-                    aio_id='race_mode_share_trip'
+                    aio_id='race_mode_share_trip',
+                    render='cube'  # the dropdowns slice the cube in the browser, no request to the server
                 ),
                 width=12  # Full width for all screen sizes
             ),
@@ -0,0 +1,66 @@
+# notes
+'''
+Offline job that fills the figure cache with every dropdown combination of every chart of the pages,
+so that after a deploy no user waits for a figure to be computed.
+The charts are the PieChartAIO and LineChartAIO instances built when the app imports the pages.
+The combinations are computed in parallel by a pool of processes, which all write to the shared filesystem cache.
+Each process loads the charts once, when it starts: with the default start method of Linux (fork) it inherits
+the app and the data from this process, on Windows and macOS (spawn) it imports the app itself.
+
+Run it from the repository root (the same folder the app is started from), once the data files are in place:
+    python src/precompute.py --processes 4
+'''
+
+# package imports
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def registered_charts():
+    '''Imports the app (and therefore the pages) and returns the charts, keyed by (class name, aio_id).'''
+    import app  # noqa: F401, builds the components of every page
+    from components.pie_chart_AIO import PieChartAIO
+    from components.line_chart_AIO import LineChartAIO
+    return {
+        (chart_class.__name__, aio_id): chart
+        for chart_class in (PieChartAIO, LineChartAIO)
+        for aio_id, chart in chart_class.instances.items()
+    }
+
+# the charts of a pool process, loaded once by load_charts
+charts = {}
+
+def load_charts():
+    '''Initializer of the pool processes.'''
+    charts.update(registered_charts())
+
+def warm(task):
+    class_name, aio_id, filters = task
+    charts[(class_name, aio_id)].warm_cache(filters)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the figure cache with every dropdown combination of every chart.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='number of worker processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    load_charts()
+    tasks = [
+        (class_name, aio_id, filters)
+        for (class_name, aio_id), chart in charts.items()
+        if chart.render != 'cube'  # drawn in the browser from the cube, nothing to cache
+        for filters in chart.filter_combinations()
+    ]
+    for chart in charts.values():
+        chart.prepare()  # load the data before the processes are forked, LAZY_PAGES would defer it
+    print(f"Warming {len(tasks)} combinations of {len(charts)} charts with {args.processes} processes.")
+    with ProcessPoolExecutor(max_workers=args.processes, initializer=load_charts) as pool:
+        for done, _ in enumerate(pool.map(warm, tasks, chunksize=16), start=1):
+            if done % 500 == 0 or done == len(tasks):
+                print(f"{done}/{len(tasks)} done ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,59 @@
 # notes
 '''
 This file is for creating a Flask server to be used for the dash app.
+The responses (callback outputs, layout, html, scripts and stylesheets) are compressed with Brotli or gzip,
+and the static assets get caching headers: a year and immutable when the url is fingerprinted
+(Dash adds ?m=<modification time> to the assets it links), a revalidation with their ETag otherwise.
 '''
 # package imports
 import os
-from flask import Flask
+from flask import Flask, request
+from flask_compress import Compress
 
 server = Flask(__name__)
 server.config.update(
     SESSION_COOKIE_SAMESITE="None",  # Change this to "Strict" or "None" as needed
     SESSION_COOKIE_SECURE=True,  # Recommended if using "None" for SAMESITE
-    SECRET_KEY=os.getenv('SECRET_KEY')
-)
\ No newline at end of file
+    SECRET_KEY=os.getenv('SECRET_KEY'),
+    COMPRESS_ALGORITHM=['br', 'gzip'],  # in the order of preference, when the browser accepts both
+    COMPRESS_BR_LEVEL=4,  # fast enough for the callback responses, which are compressed on every request
+    COMPRESS_LEVEL=6,
+    COMPRESS_MIN_SIZE=500,  # bytes
+    COMPRESS_MIMETYPES=[
+        'text/html', 'text/css', 'text/javascript', 'application/javascript', 'application/json', 'image/svg+xml'
+    ],
+)
+# NOTE: initialized here rather than with Dash(compress=True), which would force gzip only
+Compress(server)
+
+ASSETS_URL_PATH = '/assets/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # seconds
+
+
+def set_cache_headers(response, immutable):
+    '''
+    Sets the caching headers of a static response: a year and immutable for a fingerprinted url,
+    a revalidation with the ETag otherwise (answered with 304 Not Modified when the ETag matches).
+    '''
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'  # the browser revalidates with If-None-Match
+    # NOTE: Flask 2.1.0 does not add an ETag to the static files, and Flask-Compress (which runs after this hook)
+    # appends the encoding to the ETag (e.g. "abc:br"), so the suffix is ignored when the validators are compared.
+    response.direct_passthrough = False
+    if response.get_etag()[0] is None:
+        response.add_etag()
+    etag, _ = response.get_etag()
+    if etag in {tag.rsplit(':', 1)[0] for tag in request.if_none_match.as_set()}:
+        response.status_code = 304
+        response.set_data(b'')
+    return response
+
+
+@server.after_request
+def add_cache_headers(response):
+    '''Caching headers of the files of the assets folder, Dash fingerprints their urls with ?m=<modification time>.'''
+    if request.path.startswith(ASSETS_URL_PATH) and response.status_code == 200:
+        set_cache_headers(response, immutable='m' in request.args)
+    return response
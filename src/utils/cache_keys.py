@@ -0,0 +1,54 @@
+# notes
+'''
+This file builds the cache keys of the memoized chart outputs.
+A key only depends on plain values: the component class, its aio_id, the output name, the filters,
+the pivot spec, the dataset version and the code version. It never depends on repr() of the component or on the
+order of a dictionary, so every worker and every restart of the app computes the same key for the same chart.
+The code version is a fingerprint of the source files the outputs are computed by, so a deploy that
+changes how a figure is drawn does not serve the figures cached by the previous code.
+'''
+
+# package imports
+import hashlib
+import json
+
+
+def canonicalize(value):
+    '''Returns a canonical JSON text of value (sorted dictionary keys, no whitespace).'''
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+def code_version(paths, extra=()):
+    '''Short fingerprint of the content of the source files, and of extra strings (e.g. library versions).'''
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as source_file:
+            digest.update(hashlib.sha256(source_file.read()).digest())
+    for item in extra:
+        digest.update(str(item).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+def make_cache_key(component, aio_id, output, filters, pivot, dataset_version, code_version):
+    """
+    Builds the cache key of one output of an AIO component.
+
+    Parameters:
+        component (str): The name of the component class.
+        aio_id (str): The aio_id of the component instance.
+        output (str): The name of the memoized output (e.g. the method name).
+        filters (dict): The dropdown values.
+        pivot (dict): The pivot spec of the component (index and column attributes).
+        dataset_version (str): The version of the dataset behind the component.
+        code_version (str): The version of the code computing the output (see code_version).
+
+    Returns:
+        str: The cache key.
+
+    Example:
+        make_cache_key('PieChartAIO', 'race_mode_share_trip', 'make_pie_charts',
+                       {'dpurp2': 1, 'ocounty': 'all'}, {'index': 'RACE', 'column': 'tripmode'}, '3f2a9c', '81d0e4')
+    """
+    payload = canonicalize({
+        'filters': filters, 'pivot': pivot, 'dataset_version': dataset_version, 'code_version': code_version
+    })
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return f'{component}:{aio_id}:{output}:{digest}'
@@ -0,0 +1,100 @@
+# notes
+'''
+This file holds a pre-aggregated, weighted data cube.
+The cube has one axis per dimension (the dropdown columns plus the two pivot columns of a chart)
+and stores the sum of the person weights and the number of records in every cell.
+It is built with one pass over the data, after which any filter combination is a slice and a sum
+over a few hundred cells instead of a pass over the whole survey.
+'''
+
+# package imports
+import logging
+import time
+import numpy
+import pandas
+
+# local imports
+from utils.data_handling import PERSON_WEIGHT, factorize, round_significant
+
+logger = logging.getLogger(__name__)
+
+
+class WeightedCube:
+    def __init__(self, df, dimensions, weight=PERSON_WEIGHT):
+        start = time.perf_counter()
+        self.dimensions = list(dict.fromkeys(dimensions))  # drop duplicates, keep order
+        self.levels = {}  # dimension -> sorted unique values
+        codes = []
+        for dimension in self.dimensions:
+            levels, dimension_codes = factorize(df[dimension].to_numpy())
+            self.levels[dimension] = levels
+            codes.append(dimension_codes)
+        shape = tuple(len(self.levels[dimension]) for dimension in self.dimensions)
+        size = int(numpy.prod(shape))
+        flat_index = numpy.ravel_multi_index(codes, shape) if len(df) else numpy.zeros(0, dtype=numpy.intp)
+        self.weights = numpy.bincount(flat_index, weights=df[weight].to_numpy(), minlength=size).reshape(shape)
+        self.counts = numpy.bincount(flat_index, minlength=size).reshape(shape)
+        self.build_time = time.perf_counter() - start  # seconds
+        logger.info("Built a %s cube over %s in %.3f s.", 'x'.join(map(str, shape)), self.dimensions, self.build_time)
+
+    @property
+    def nbytes(self):
+        '''Memory used by the cube, in bytes.'''
+        return self.weights.nbytes + self.counts.nbytes
+
+    def to_dict(self, digits=6):
+        '''
+        The cube as plain lists, for the browser: the dimensions, their levels, and the weights of the cells
+        and whether they hold any record, flattened in row-major order. The weights are rounded to digits
+        significant digits. The record counts stay on the server, the page would otherwise expose
+        how many survey records fall in each small cell.
+        '''
+        return {
+            'dimensions': self.dimensions,
+            'levels': [self.levels[dimension].tolist() for dimension in self.dimensions],
+            'weights': round_significant(self.weights.ravel(), digits).tolist(),
+            'present': (self.counts > 0).ravel().tolist(),
+        }
+
+    def covers(self, conditions, var1, var2):
+        '''Checks that the cube can answer a cross-tabulation of var1 and var2 under the given conditions.'''
+        return all(column in self.levels for column in [*conditions, var1, var2]) and var1 != var2
+
+    def _positions(self, dimension, value):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        return numpy.flatnonzero(numpy.isin(self.levels[dimension], values))
+
+    def cross_tab(self, conditions, var1, var2):
+        """
+        Slices the cube with the conditions and sums it into a var1 x var2 table.
+
+        The result matches `cross_tab(filter_df(df, conditions), var1, var2)`: only the rows and
+        columns with at least one record are kept, sorted by value.
+
+        Parameters:
+            conditions (dict): A dictionary where keys are dimension names and values are filter criteria.
+            var1 (str): The dimension on the rows of the table.
+            var2 (str): The dimension on the columns of the table.
+
+        Returns:
+            pd.DataFrame: The weighted cross-tabulation.
+        """
+        weights, counts = self.weights, self.counts
+        for axis, dimension in enumerate(self.dimensions):
+            if dimension in conditions:
+                positions = self._positions(dimension, conditions[dimension])
+                weights = weights.take(positions, axis=axis)
+                counts = counts.take(positions, axis=axis)
+
+        row_axis, column_axis = self.dimensions.index(var1), self.dimensions.index(var2)
+        other_axes = tuple(axis for axis in range(len(self.dimensions)) if axis not in (row_axis, column_axis))
+        weights, counts = weights.sum(axis=other_axes), counts.sum(axis=other_axes)
+        if row_axis > column_axis:  # the remaining axes keep the cube order
+            weights, counts = weights.T, counts.T
+
+        rows, columns = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+        return pandas.DataFrame(
+            weights[rows][:, columns],
+            index=pandas.Index(self.levels[var1][rows].tolist(), name=var1),
+            columns=pandas.Index(self.levels[var2][columns].tolist(), name=var2),
+        )
@@ -1,76 +1,302 @@
 import pandas
+import numpy
 
 # CONSTANTS
 PERSON_WEIGHT = 'psexpfac'
 
-def filter_df(df, conditions):
+def filter_mask(df, conditions):
     """
-    Filters a DataFrame based on a dictionary of conditions.
+    Builds one boolean row mask for a dictionary of conditions.
 
     Parameters:
         df (pd.DataFrame): The DataFrame to filter.
         conditions (dict): A dictionary where keys are column names and values are filter criteria.
-    
-    Returns:
-        pd.DataFrame: The filtered DataFrame.
 
-    Example:
-        filter_df(tour_data, {'ocounty':5, 'tourmode2':3})
+    Returns:
+        numpy.ndarray: A boolean array, True for the rows matching all the conditions.
     """
-    filtered_df = df.copy()
+    mask = numpy.ones(len(df), dtype=bool)
     for column, value in conditions.items():
+        values = df[column].to_numpy()
         if isinstance(value, (list, tuple)):
             # Filter with multiple values
-            filtered_df = filtered_df[filtered_df[column].isin(value)]
+            mask &= numpy.isin(values, value)
         else:
             # Filter with a single value
-            filtered_df = filtered_df[filtered_df[column] == value]
-    return filtered_df
+            mask &= values == value
+    return mask
+
+def filter_df(df, conditions, columns=None, index=None):
+    """
+    Filters a DataFrame based on a dictionary of conditions.
+
+    The conditions are combined into a single mask and the DataFrame is sliced once,
+    so no intermediate DataFrame is created per condition.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to filter.
+        conditions (dict): A dictionary where keys are column names and values are filter criteria.
+        columns (list, optional): The columns to return. All columns are returned by default.
+        index (FilterIndex, optional): An index over df. Used instead of scanning when it covers all the condition columns.
+
+    Returns:
+        pd.DataFrame: The filtered DataFrame.
+
+    Example:
+        filter_df(tour_data, {'ocounty':5, 'tourmode2':3}, columns=['RACE', 'tautodist'])
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    if not conditions:
+        return df[columns]
+    if index is not None and index.covers(conditions):
+        mask = index.mask(conditions)
+    else:
+        mask = filter_mask(df, conditions)
+    return df.loc[mask, columns]
+
+
+
+def factorize(values, dense=False):
+    """
+    Encodes an array as integer codes into its sorted unique values.
 
+    Integer columns with a small range of values (all the survey codes) are encoded in linear time
+    from their offset to the smallest value; anything else falls back to numpy.unique.
 
+    Parameters:
+        values (numpy.ndarray): The values to encode.
+        dense (bool): For small-range integers, return every value between the min and the max as a level,
+            including the values that do not occur. This skips the remapping of the codes.
+
+    Returns:
+        tuple: The sorted levels and the position of each value in the levels (codes).
+
+    Example:
+        factorize(numpy.array([5, 1, 5]))
+        # Output: (array([1, 5]), array([1, 0, 1]))
+    """
+    if numpy.issubdtype(values.dtype, numpy.integer) and len(values):
+        low = int(values.min())
+        span = int(values.max()) - low + 1
+        if span <= (1 << 10 if dense else max(len(values), 1 << 16)):
+            offsets = values.astype(numpy.intp)
+            offsets -= low
+            if dense:
+                return numpy.arange(low, low + span).astype(values.dtype), offsets
+            present = numpy.bincount(offsets, minlength=span) > 0
+            levels = (numpy.flatnonzero(present) + low).astype(values.dtype)
+            return levels, (numpy.cumsum(present) - 1)[offsets]
+    return numpy.unique(values, return_inverse=True)
 
 def cross_tab(df, var1, var2):
     """
     Creates a pivot table (cross-tabulation) for two variables in the DataFrame.
 
+    The values are the sums of the person weights. Both variables are encoded as integer codes and
+    the table is filled with a weighted bincount over the flat (row, column) cell index.
+
     Parameters:
         df (pd.DataFrame): The DataFrame containing the data.
         var1 (str): The name of the first variable (rows of the pivot table).
         var2 (str): The name of the second variable (columns of the pivot table).
     
     Returns:
-        pd.DataFrame: A pivot table with counts for the cross-tabulation.
+        pd.DataFrame: A pivot table with the weighted counts, rows and columns sorted by value.
     Example:
         cross_tab(df, RACE, MODE)
     """
-    pivot_table = pandas.pivot_table(
-        df,
-        values=PERSON_WEIGHT,  
-        index=var1,   
-        columns=var2, 
-        aggfunc='sum', 
-        fill_value=0  
+    rows, cells = factorize(df[var1].to_numpy(), dense=True)
+    columns, column_codes = factorize(df[var2].to_numpy(), dense=True)
+    cells = cells * len(columns)
+    cells += column_codes
+    shape = (len(rows), len(columns))
+    table = numpy.bincount(cells, weights=df[PERSON_WEIGHT].to_numpy(), minlength=shape[0] * shape[1]).reshape(shape)
+    counts = numpy.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+    # keep only the values that occur, like pandas.pivot_table
+    keep_rows, keep_columns = counts.any(axis=1), counts.any(axis=0)
+    return pandas.DataFrame(
+        table[keep_rows][:, keep_columns],
+        index=pandas.Index(rows[keep_rows], name=var1),
+        columns=pandas.Index(columns[keep_columns], name=var2)
     )
-    pivot_table_sorted = pivot_table.sort_index(axis=0)  # Sort rows numerically
-    pivot_table_sorted = pivot_table_sorted.sort_index(axis=1)
-    return pivot_table_sorted
+
+def group_arrays(keys, *columns):
+    """
+    Splits one or more arrays into contiguous numpy arrays per group.
+
+    The rows are ordered by group with one stable argsort (a radix sort for the small integer codes)
+    and each column is gathered once and split at the group offsets, so no Python object is
+    created per sample.
+
+    Parameters:
+        keys (numpy.ndarray): The group of each row.
+        *columns (numpy.ndarray): The arrays to split, aligned with keys.
+
+    Returns:
+        dict: A dictionary where keys are the sorted unique group values and values are tuples
+        with the slice of each column for that group.
+
+    Example:
+        group_arrays(numpy.array([2, 1, 2]), numpy.array([10., 20., 30.]))
+        # Output: {1: (array([20.]),), 2: (array([10., 30.]),)}
+    """
+    levels, codes = factorize(numpy.asarray(keys))
+    codes = codes.astype(numpy.min_scalar_type(max(len(levels) - 1, 0)))
+    order = numpy.argsort(codes, kind='stable')
+    offsets = numpy.cumsum(numpy.bincount(codes, minlength=len(levels)))[:-1]
+    groups = [numpy.split(numpy.asarray(column)[order], offsets) for column in columns]
+    return {
+        level: tuple(group[position] for group in groups)
+        for position, level in enumerate(levels.tolist())
+    }
 
 def group_to_dict(df, var1, var2):
     """
-    Groups the DataFrame by one column and aggregates another column into lists.
+    Groups the DataFrame by one column and splits another column into arrays.
 
     Parameters:
         df (pd.DataFrame): The DataFrame containing the data.
         var1 (str): The column to group by.
-        var2 (str): The column to aggregate into lists.
+        var2 (str): The column to split into arrays.
     
     Returns:
-        dict: A dictionary where keys are unique values of var1 and values are lists of corresponding var2 values.
+        dict: A dictionary where keys are unique values of var1 and values are numpy arrays of corresponding var2 values.
 
     Example:
         df = pd.DataFrame({'A': [1, 1, 2], 'B': ['x', 'y', 'z']})
         group_to_dict(df, 'A', 'B') 
-        # Output: {1: ['x', 'y'], 2: ['z']}
+        # Output: {1: array(['x', 'y']), 2: array(['z'])}
+    """
+    return {
+        key: values
+        for key, (values,) in group_arrays(df[var1].to_numpy(), df[var2].to_numpy()).items()
+    }
+
+def _normalized_weights(count, weights):
+    '''Sample weights summing to 1 (equal weights by default), all 0 when the weights sum to 0.'''
+    if weights is None:
+        return numpy.full(count, 1 / count)
+    weights = numpy.asarray(weights, dtype=float)
+    total = numpy.sum(weights)
+    return weights / total if total > 0 else numpy.zeros(count)
+
+def kde_bandwidth(values, weights=None, bw_method='silverman', bw_adjust=1.0):
+    """
+    Computes the Gaussian kernel bandwidth (standard deviation) the way scipy.stats.gaussian_kde does.
+
+    Parameters:
+        values (numpy.ndarray): The samples.
+        weights (numpy.ndarray, optional): The sample weights.
+        bw_method (str or float): 'silverman', 'scott' or a fixed bandwidth factor.
+        bw_adjust (float): Multiplier applied to the bandwidth factor.
+
+    Returns:
+        float: The bandwidth, in the unit of the samples. 0.0 for a single sample, samples without spread
+        or weights summing to 0, which the KDE functions turn into a zero density.
+    """
+    values = numpy.asarray(values, dtype=float)
+    weights = _normalized_weights(len(values), weights)
+    if not weights.any():
+        return 0.0  # no weight, nothing to estimate
+    n_effective = 1 / numpy.sum(weights ** 2)
+    if n_effective <= 1 or numpy.ptp(values) == 0:
+        return 0.0  # the variance is 0/0 or 0
+    if bw_method == 'silverman':
+        factor = (n_effective * 3 / 4) ** (-1 / 5)
+    elif bw_method == 'scott':
+        factor = n_effective ** (-1 / 5)
+    else:
+        factor = float(bw_method)
+    mean = numpy.sum(weights * values)
+    variance = numpy.sum(weights * (values - mean) ** 2) / (1 - numpy.sum(weights ** 2))  # unbiased, as numpy.cov
+    return factor * bw_adjust * numpy.sqrt(variance)
+
+def exact_kde(values, bandwidth, x, weights=None, chunk_size=4096):
+    """
+    Evaluates a Gaussian kernel density estimate on the points x, summing the kernel of every sample
+    (what scipy.stats.gaussian_kde does in one dimension). The samples are processed in chunks to bound the memory.
+
+    Parameters:
+        values (numpy.ndarray): The samples.
+        bandwidth (float): The kernel standard deviation (see kde_bandwidth).
+        x (numpy.ndarray): The points to evaluate the density on.
+        weights (numpy.ndarray, optional): The sample weights.
+        chunk_size (int): The number of samples evaluated at once.
+
+    Returns:
+        numpy.ndarray: The density at each point of x.
+    """
+    values = numpy.asarray(values, dtype=float)
+    weights = _normalized_weights(len(values), weights)
+    x = numpy.asarray(x, dtype=float)
+    if not bandwidth > 0:
+        return numpy.zeros(len(x))  # degenerate sample, no density to spread
+    density = numpy.zeros(len(x))
+    for start in range(0, len(values), chunk_size):
+        distances = (x[:, None] - values[None, start:start + chunk_size]) / bandwidth
+        density += numpy.exp(-0.5 * distances ** 2) @ weights[start:start + chunk_size]
+    return density / (bandwidth * numpy.sqrt(2 * numpy.pi))
+
+def binned_kde(values, bandwidth, x, weights=None, min_bins=1024, truncate=5.0):
+    """
+    Evaluates a Gaussian kernel density estimate on the points x.
+
+    The samples are linearly binned onto a regular grid (at least 4 bins per bandwidth) and the
+    grid is convolved with the Gaussian kernel by FFT, so the cost barely depends on the number of samples.
+
+    Parameters:
+        values (numpy.ndarray): The samples.
+        bandwidth (float): The kernel standard deviation (see kde_bandwidth).
+        x (numpy.ndarray): Sorted points to evaluate the density on, within [min(values), max(values)].
+        weights (numpy.ndarray, optional): The sample weights.
+        min_bins (int): The minimum number of grid bins.
+        truncate (float): The kernel is cut off after this many bandwidths.
+
+    Returns:
+        numpy.ndarray: The density at each point of x.
     """
-    return df.groupby(var1)[var2].apply(list).to_dict()
+    values = numpy.asarray(values, dtype=float)
+    weights = _normalized_weights(len(values), weights)
+    low, high = values.min(), values.max()
+    if not bandwidth > 0 or high == low:
+        return numpy.zeros(len(x))  # degenerate sample, no density to spread
+
+    n_bins = int(numpy.clip(numpy.ceil(4 * (high - low) / bandwidth) + 1, min_bins, 1 << 20))
+    step = (high - low) / (n_bins - 1)
+    position = (values - low) / step
+    left = numpy.minimum(position.astype(numpy.intp), n_bins - 2)
+    fraction = position - left
+    grid = (
+        numpy.bincount(left, weights=weights * (1 - fraction), minlength=n_bins)
+        + numpy.bincount(left + 1, weights=weights * fraction, minlength=n_bins)
+    )
+
+    half_width = min(n_bins - 1, int(numpy.ceil(truncate * bandwidth / step)))
+    offsets = numpy.arange(-half_width, half_width + 1) * step
+    kernel = numpy.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * numpy.sqrt(2 * numpy.pi))
+    size = 1 << int(numpy.ceil(numpy.log2(n_bins + 2 * half_width)))  # linear (not circular) convolution
+    density = numpy.fft.irfft(numpy.fft.rfft(grid, size) * numpy.fft.rfft(kernel, size), size)
+    density = density[half_width:half_width + n_bins]
+    return numpy.interp(x, numpy.linspace(low, high, n_bins), numpy.maximum(density, 0))
 
+
+def round_significant(values, digits=5):
+    """
+    Rounds an array to a number of significant digits relative to its largest absolute value,
+    so that it serializes to short JSON numbers without a visible change on a chart.
+
+    Parameters:
+        values (numpy.ndarray): The values to round.
+        digits (int): The number of significant digits of the largest value.
+
+    Returns:
+        numpy.ndarray: The rounded values.
+
+    Example:
+        round_significant(numpy.array([123.456789, 0.0123456]), 4) -> array([123.5, 0.0])
+    """
+    values = numpy.asarray(values, dtype=float)
+    largest = numpy.max(numpy.abs(values)) if len(values) else 0.0
+    if not numpy.isfinite(largest) or largest == 0:
+        return values
+    return numpy.round(values, digits - 1 - int(numpy.floor(numpy.log10(largest))))
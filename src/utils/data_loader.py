@@ -1,31 +1,253 @@
 # notes
 '''
-This file is used for handling anything data (csv) related. 
+This file is used for handling anything data (csv) related.
 It can also be used as the pre-processing step.
+
+The processed pickles are converted once into a columnar store: a folder next to the pickle
+with one `.npy` file per needed column and a small manifest. The frames are then built from
+memory-mapped columns, so only the needed columns are read and every worker shares the same
+pages through the OS page cache instead of keeping its own private copy.
+The store is built under an exclusive lock file (`<store>.lock`), so when several workers find it
+stale at the same time, one builds it and the others wait and read its copy.
+Before the columns are written, they are compacted to the dtypes in `COLUMN_DTYPES`.
 '''
 
 # package imports
 import pandas
+import numpy
+import contextlib
+import hashlib
+import json
+import logging
 import os
+import shutil
+import tempfile
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: the store is only built by one process at a time there (no gunicorn)
+    fcntl = None
 
-def get_tour_data():
-    cwd = os.getcwd()
-    data_path = os.path.join(cwd, 'src', 'assets', 'data', 'tour_data_processed_0701.pkl')
-    needed_columns = ['RACE', 'tourmode', 'psexpfac', 'pdpurp2', 'pdpurp', 'ocounty', 'HISP_B', 'lowinc','distcat', 'tautodist','distcat', 'tourmode2', 'timecat2', 'ttravtime']
-    df = pandas.read_pickle(data_path)
-    assert all(column in df.columns for column in needed_columns), "All columns are available."
+# local imports
+from utils.profiling import startup_profile
+
+# CONSTANTS
+DATA_DIR = os.path.join(os.getcwd(), 'src', 'assets', 'data')
+TOUR_DATA_PATH = os.path.join(DATA_DIR, 'tour_data_processed_0701.pkl')
+TRIP_DATA_PATH = os.path.join(DATA_DIR, 'trip_data_processed_0701.pkl')
+TOUR_COLUMNS = ['RACE', 'tourmode', 'psexpfac', 'pdpurp2', 'pdpurp', 'ocounty', 'HISP_B', 'lowinc', 'distcat', 'tautodist', 'tourmode2', 'timecat2', 'ttravtime']
+TRIP_COLUMNS = ['RACE', 'tripmode', 'psexpfac', 'dpurp2', 'dpurp', 'ocounty', 'HISP_B', 'lowinc', 'distcat', 'travdist', 'tripmode2', 'timecat2', 'ttravtime']
+MANIFEST_NAME = 'manifest.json'
+# Storage dtype of each column. The coded columns all have fewer than 16 levels.
+COLUMN_DTYPES = {
+    'RACE': 'int8',
+    'tourmode': 'int8',
+    'tripmode': 'int8',
+    'tourmode2': 'int8',
+    'tripmode2': 'int8',
+    'pdpurp2': 'int8',
+    'dpurp2': 'int8',
+    'pdpurp': 'int8',
+    'dpurp': 'int8',
+    'ocounty': 'int8',
+    'HISP_B': 'int8',
+    'lowinc': 'int8',
+    'distcat': 'int8',
+    'timecat2': 'int8',
+    'travdist': 'float32',
+    'tautodist': 'float32',
+    'ttravtime': 'float32',
+    'psexpfac': 'float32',
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _prepare_tour_data(df):
     df = df[df['tourmode']!=0] # remove 'other' mode
-    df['lowinc'] = df['lowinc'] + 1 # I need my categories to start from 1.  
-    df['HISP_B'] = df['HISP_B'] + 1 # I need my categories to start from 1. 
+    df['lowinc'] = df['lowinc'] + 1 # I need my categories to start from 1.
+    df['HISP_B'] = df['HISP_B'] + 1 # I need my categories to start from 1.
     return df
 
-def get_trip_data():
-    cwd = os.getcwd()
-    data_path = os.path.join(cwd, 'src', 'assets', 'data', 'trip_data_processed_0701.pkl')
-    needed_columns = ['RACE', 'tripmode', 'psexpfac', 'dpurp2', 'dpurp', 'ocounty', 'HISP_B', 'lowinc','distcat', 'travdist','distcat', 'tripmode2', 'timecat2', 'ttravtime']
-    df = pandas.read_pickle(data_path)
-    assert all(column in df.columns for column in needed_columns), "All columns are available."  
+def _prepare_trip_data(df):
     df = df[df['tripmode']!=0] # remove 'other' mode
     df['lowinc'] = df['lowinc'] + 1 # I need my categories to start from 1.
     df['HISP_B'] = df['HISP_B'] + 1 # I need my categories to start from 1.
     return df
+
+def _fits(values, dtype):
+    '''Checks that casting values to dtype is lossless.'''
+    if numpy.issubdtype(dtype, numpy.floating):
+        return numpy.issubdtype(values.dtype, numpy.number)
+    if numpy.issubdtype(values.dtype, numpy.floating) and not numpy.array_equal(values, numpy.floor(values)):
+        return False  # NaN or fractional codes
+    if not numpy.issubdtype(values.dtype, numpy.number):
+        return False
+    limits = numpy.iinfo(dtype)
+    return len(values) == 0 or (limits.min <= values.min() and values.max() <= limits.max)
+
+def compact_dtypes(df, schema=COLUMN_DTYPES):
+    """
+    Casts the columns listed in the schema to their (smaller) target dtype.
+
+    Columns whose values do not fit the target dtype are left as they are.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to compact.
+        schema (dict): A dictionary of column names and target dtypes.
+
+    Returns:
+        tuple: The compacted DataFrame and the number of bytes saved.
+    """
+    columns = {}
+    bytes_saved = 0
+    for column in df.columns:
+        values = df[column].to_numpy()
+        dtype = numpy.dtype(schema.get(column, values.dtype))
+        if dtype != values.dtype:
+            if _fits(values, dtype):
+                bytes_saved += values.nbytes - len(values) * dtype.itemsize
+                values = values.astype(dtype)
+            else:
+                logger.warning("Column %s does not fit in %s, keeping %s.", column, dtype, values.dtype)
+        columns[column] = values
+    return pandas.DataFrame(columns, index=df.index), bytes_saved
+
+def store_path(data_path):
+    '''Folder holding the columnar copy of a processed pickle.'''
+    return os.path.splitext(data_path)[0] + '_columns'
+
+def _source_stamp(data_path):
+    stat = os.stat(data_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+def dataset_version(data_path):
+    '''Short fingerprint of a processed pickle (its size and modification time), changes whenever the file is replaced.'''
+    if os.path.exists(data_path):
+        stamp = _source_stamp(data_path)
+    else:
+        manifest = _read_manifest(store_path(data_path))  # only the columnar store was shipped
+        stamp = manifest['source'] if manifest else None
+    return hashlib.sha256(json.dumps(stamp, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def _is_fresh(manifest, data_path, columns):
+    if manifest is None or not set(columns) <= set(manifest['columns']):
+        return False
+    if any(manifest.get('schema', {}).get(column) != COLUMN_DTYPES.get(column) for column in columns):
+        return False  # the column dtypes changed since the store was built
+    if not os.path.exists(data_path):
+        return True  # only the columnar store was shipped
+    return manifest['source'] == _source_stamp(data_path)
+
+def build_column_store(data_path, columns, prepare):
+    """
+    Converts a processed pickle into a folder of per-column `.npy` files.
+
+    The store always holds every column of COLUMN_DTYPES found in the pickle (the columns the
+    pre-processing needs among them), so callers asking for different subsets share one store.
+    The store is written to a temporary folder first and then renamed into place, so a reader
+    never sees a partial store. Call it while holding `_store_lock`: a fresh store, which another
+    process may be reading, is never replaced.
+
+    Parameters:
+        data_path (str): Path to the processed pickle.
+        columns (list): The requested columns, stored as well when they are not in COLUMN_DTYPES.
+        prepare (callable): Pre-processing applied to the stored columns before they are split.
+    """
+    df = pandas.read_pickle(data_path)
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} not in {os.path.basename(data_path)}")
+    columns = list(dict.fromkeys([*(column for column in COLUMN_DTYPES if column in df.columns), *columns]))
+    df, bytes_saved = compact_dtypes(prepare(df[columns]))
+    logger.info("Compacted %s: %.1f MB saved.", os.path.basename(data_path), bytes_saved / 1e6)
+
+    target = store_path(data_path)
+    tmp_path = tempfile.mkdtemp(prefix='.building_', dir=os.path.dirname(data_path))
+    try:
+        for column in columns:
+            numpy.save(os.path.join(tmp_path, f'{column}.npy'), df[column].to_numpy(), allow_pickle=False)
+        manifest = {
+            'source': _source_stamp(data_path),
+            'rows': len(df),
+            'columns': list(columns),
+            'schema': {column: COLUMN_DTYPES.get(column) for column in columns},
+            'bytes_saved': bytes_saved,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_NAME), 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        if _is_fresh(_read_manifest(target), data_path, columns):
+            return  # built in the meantime by a process without the lock (e.g. on Windows)
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(tmp_path, target)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+@contextlib.contextmanager
+def _store_lock(path):
+    '''Exclusive lock of a columnar store, held across processes while the store is checked and built.'''
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_column_store(data_path, columns, prepare):
+    """
+    Loads the requested columns from the columnar store, (re)building it when the pickle changed
+    or when a requested column is not stored.
+
+    Returns:
+        pd.DataFrame: A frame whose columns are read-only views on memory-mapped files.
+    """
+    columns = list(dict.fromkeys(columns))  # drop duplicates, keep order
+    path = store_path(data_path)
+    if not _is_fresh(_read_manifest(path), data_path, columns):
+        with _store_lock(path):
+            # another worker may have built it while this one waited for the lock
+            if not _is_fresh(_read_manifest(path), data_path, columns):
+                build_column_store(data_path, columns, prepare)
+    arrays = {
+        column: numpy.asarray(numpy.load(os.path.join(path, f'{column}.npy'), mmap_mode='r'))
+        for column in columns
+    }
+    df = pandas.DataFrame(arrays, copy=False)
+    df.attrs['dataset_version'] = dataset_version(data_path)
+    return df
+
+@startup_profile.timed('get_tour_data')
+def get_tour_data(columns=TOUR_COLUMNS):
+    return load_column_store(TOUR_DATA_PATH, columns, _prepare_tour_data)
+
+@startup_profile.timed('get_trip_data')
+def get_trip_data(columns=TRIP_COLUMNS):
+    return load_column_store(TRIP_DATA_PATH, columns, _prepare_trip_data)
+
+def lazy_loader(get_data, data_path):
+    '''
+    Wraps get_tour_data or get_trip_data for the lazy pages: the frame is loaded on the first call
+    (by one thread, the others wait for it) and the same frame is returned afterwards.
+    The dataset version is known without loading the data, as the dataset_version attribute.
+    '''
+    lock = threading.Lock()
+    frames = []
+
+    def load():
+        with lock:
+            if not frames:
+                frames.append(get_data())
+        return frames[0]
+
+    load.dataset_version = dataset_version(data_path)
+    return load
@@ -0,0 +1,100 @@
+# notes
+'''
+This file holds an inverted index over the dropdown columns of a dataset.
+For every (column, value) pair it keeps a bitmap of the matching rows (packed 8 rows per byte),
+so any combination of dropdown filters resolves with a few bitwise ANDs instead of a scan of the columns.
+One index is shared by all the components built on the same DataFrame (see `get_filter_index`),
+and it is dropped when that DataFrame is freed.
+'''
+
+# package imports
+import logging
+import threading
+import time
+import weakref
+import numpy
+
+logger = logging.getLogger(__name__)
+
+# id of the DataFrame -> FilterIndex. The entry is removed when the DataFrame is freed, before its id can be reused.
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+class FilterIndex:
+    def __init__(self, df, columns=()):
+        self._df = weakref.ref(df)  # the index does not keep its DataFrame alive
+        self.n_rows = len(df)
+        self.bitmaps = {}  # column -> {value: packed row bitmap}
+        self.build_time = 0.0  # seconds
+        self._empty = numpy.zeros((self.n_rows + 7) // 8, dtype=numpy.uint8)
+        self._lock = threading.Lock()
+        self.add_columns(columns)
+
+    @property
+    def df(self):
+        return self._df()
+
+    def add_columns(self, columns):
+        '''Indexes the given columns. Columns that are already indexed are skipped.'''
+        with self._lock:  # two components of a page may add the same columns from two threads
+            start = time.perf_counter()
+            new_columns = [column for column in columns if column not in self.bitmaps]
+            for column in new_columns:
+                values = self.df[column].to_numpy()
+                self.bitmaps[column] = {
+                    value.item(): numpy.packbits(values == value)
+                    for value in numpy.unique(values)
+                }
+        if new_columns:
+            elapsed = time.perf_counter() - start
+            self.build_time += elapsed
+            logger.info("Indexed %s in %.3f s (index size %.2f MB).", new_columns, elapsed, self.nbytes / 1e6)
+
+    @property
+    def nbytes(self):
+        '''Memory used by the bitmaps, in bytes.'''
+        return sum(bitmap.nbytes for bitmaps in self.bitmaps.values() for bitmap in bitmaps.values())
+
+    def covers(self, conditions):
+        '''Checks that every column of the conditions is indexed.'''
+        return all(column in self.bitmaps for column in conditions)
+
+    def _bitmap(self, column, value):
+        if isinstance(value, (list, tuple)):
+            bitmap = self._empty.copy()
+            for item in value:
+                bitmap |= self.bitmaps[column].get(item, self._empty)
+            return bitmap
+        return self.bitmaps[column].get(value, self._empty)
+
+    def mask(self, conditions):
+        """
+        Resolves a dictionary of conditions into a boolean row mask.
+
+        Parameters:
+            conditions (dict): A dictionary where keys are indexed column names and values are filter criteria.
+
+        Returns:
+            numpy.ndarray: A boolean array, True for the rows matching all the conditions.
+        """
+        bits = None
+        for column, value in conditions.items():
+            bitmap = self._bitmap(column, value)
+            if bits is None:
+                bits = bitmap.copy()
+            else:
+                bits &= bitmap
+        if bits is None:
+            return numpy.ones(self.n_rows, dtype=bool)
+        return numpy.unpackbits(bits, count=self.n_rows).view(bool)
+
+
+def get_filter_index(df):
+    '''Returns the index shared by all the components built on df, creating an empty one if needed.'''
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(id(df))
+        if index is None or index.df is not df:
+            index = _INDEXES[id(df)] = FilterIndex(df)
+            weakref.finalize(df, _INDEXES.pop, id(df), None)
+        return index
@@ -2,21 +2,63 @@
 '''
 This file is used for handling anything image related.
 I suggest handling the local file encoding/decoding here as well as fetching any external images.
+
+The logos are served by the route /_images/<name>, with a fingerprint of their content in the url (?v=...),
+so the browser caches them for good and downloads them again only when a file changes.
+The SVG files are minified once, when the app starts.
 '''
 
 # package imports
-import base64
+import hashlib
+import mimetypes
 import os
+import re
+from flask import abort, request
+
+# local imports
+from server import server, set_cache_headers
+
+IMAGES_URL_PATH = '/_images/'
 
-# logo information - dvrpc logo
 cwd = os.getcwd()
-logo_path = os.path.join(cwd, 'src', 'assets', 'logos', '1a_ColorPrimarySmall.png')
-logo_tunel = base64.b64encode(open(logo_path, 'rb').read())
-logo_encoded = 'data:image/png;base64,{}'.format(logo_tunel.decode())
-# logo information - equity dash logo
-logo_path_equity_dash = os.path.join(cwd, 'src', 'assets', 'logos', 'dvrpc_equity_dash_logo.svg')
-with open(logo_path_equity_dash, 'rb') as logo_file:
-    logo_tunel_equity_dash = base64.b64encode(logo_file.read())
-logo_encoded_equity_dash = 'data:image/svg+xml;base64,{}'.format(logo_tunel_equity_dash.decode())
+logos_folder = os.path.join(cwd, 'src', 'assets', 'logos')
+
 
+def minify_svg(text):
+    '''Removes the comments and the whitespace that does not change the drawing (the logos have no <text> elements).'''
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
+    text = re.sub(r'>\s+<', '><', text)
+    return re.sub(r'\s+', ' ', text).strip()
 
+def load_image(path):
+    '''Reads an image file and returns (content, mimetype, fingerprint). SVG files are minified.'''
+    mimetype = mimetypes.guess_type(path)[0]
+    with open(path, 'rb') as image_file:
+        content = image_file.read()
+    if mimetype == 'image/svg+xml':
+        content = minify_svg(content.decode('utf-8')).encode('utf-8')
+    return content, mimetype, hashlib.sha256(content).hexdigest()[:12]
+
+# file name -> (content, mimetype, fingerprint)
+images = {
+    name: load_image(os.path.join(logos_folder, name))
+    for name in ['1a_ColorPrimarySmall.png', 'dvrpc_equity_dash_logo.svg']
+}
+
+def image_url(name):
+    '''The fingerprinted url of an image.'''
+    return f'{IMAGES_URL_PATH}{name}?v={images[name][2]}'
+
+@server.route(f'{IMAGES_URL_PATH}<name>')
+def serve_image(name):
+    if name not in images:
+        abort(404)
+    content, mimetype, fingerprint = images[name]
+    response = server.response_class(content, mimetype=mimetype)
+    response.set_etag(fingerprint)
+    return set_cache_headers(response, immutable=request.args.get('v') == fingerprint)
+
+# logo information - dvrpc logo
+logo_url = image_url('1a_ColorPrimarySmall.png')
+# logo information - equity dash logo
+logo_url_equity_dash = image_url('dvrpc_equity_dash_logo.svg')
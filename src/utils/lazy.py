@@ -0,0 +1,40 @@
+# notes
+'''
+This file holds the helper the AIO components use to build their data (DataFrame, filter index, cube)
+on first use with LAZY_PAGES. functools.cached_property is not locked since Python 3.12, so the warm-up
+thread and a first request could both build the same cube; locked_cached_property builds it once.
+'''
+
+# package imports
+import threading
+
+# the per-instance lock of locked_cached_property, created on first use
+_LOCK_ATTRIBUTE = '_lazy_lock'
+_LOCKS_LOCK = threading.Lock()
+
+
+class locked_cached_property:
+    '''
+    Like functools.cached_property, but the value is computed by one thread while the others wait for it.
+    The lock is re-entrant and shared by the properties of an instance, so a property can use another one.
+    '''
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        values = instance.__dict__
+        if self.name in values:
+            return values[self.name]
+        with _LOCKS_LOCK:
+            lock = values.setdefault(_LOCK_ATTRIBUTE, threading.RLock())
+        with lock:
+            if self.name not in values:
+                values[self.name] = self.function(instance)
+            return values[self.name]
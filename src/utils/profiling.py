@@ -0,0 +1,123 @@
+# notes
+'''
+This file is used for tracing the startup of the app: the wall time and the change of resident memory
+of each phase (imports, data loading, page import, AIO construction, callback registration).
+Tracing is off unless STARTUP_PROFILE is set to the path of the JSON report, written by `finish`
+once the app is imported. The phases can be nested, and the same phase can run several times
+(one AIO construction per chart): the report lists every run and the totals per phase name.
+`check_budgets` compares a report with budgets in seconds, see src/check_startup.py.
+Only the standard library is used, so the profiler can be imported before anything else.
+'''
+
+# package imports
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+# local imports
+from utils.settings import STARTUP_PROFILE
+
+
+def rss_bytes():
+    '''Resident memory of the process (the peak resident memory where /proc is not available).'''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, kB elsewhere
+
+
+class StartupProfile:
+    def __init__(self, report_path=None):
+        self.report_path = report_path
+        self.enabled = bool(report_path)
+        self.start = time.perf_counter()
+        self.start_rss = rss_bytes() if self.enabled else 0
+        self.phases = []  # every run of a phase, in the order they started
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        record = {'name': name, 'depth': self._depth, 'start_seconds': time.perf_counter() - self.start}
+        self.phases.append(record)
+        rss = rss_bytes()
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['seconds'] = time.perf_counter() - start
+            record['rss_delta_mb'] = (rss_bytes() - rss) / 1024 ** 2
+
+    def phase(self, name):
+        '''Context manager recording the wall time and the memory of a phase (does nothing when tracing is off).'''
+        return self._phase(name) if self.enabled else contextlib.nullcontext()
+
+    def timed(self, name):
+        '''Decorator recording every call of a function as the phase name.'''
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self):
+        totals = {}
+        for record in self.phases:
+            if 'seconds' not in record:
+                continue  # still running
+            total = totals.setdefault(record['name'], {'count': 0, 'seconds': 0.0, 'rss_delta_mb': 0.0})
+            total['count'] += 1
+            total['seconds'] += record['seconds']
+            total['rss_delta_mb'] += record['rss_delta_mb']
+        return {
+            'pid': os.getpid(),
+            'total_seconds': time.perf_counter() - self.start,
+            'rss_mb': rss_bytes() / 1024 ** 2,
+            'rss_delta_mb': (rss_bytes() - self.start_rss) / 1024 ** 2,
+            'totals': totals,
+            'phases': self.phases,
+        }
+
+    def finish(self):
+        '''Writes the report to STARTUP_PROFILE, when tracing is on.'''
+        if not self.enabled:
+            return None
+        report = self.report()
+        with open(self.report_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        return report
+
+
+def check_budgets(report, budgets):
+    """
+    Compares a startup report with budgets.
+
+    Parameters:
+        report (dict): A report of StartupProfile.report.
+        budgets (dict): Phase name -> maximum seconds (the sum of its runs). 'total' is the whole startup.
+
+    Returns:
+        list: (name, seconds, budget) of every exceeded budget. A phase missing from the report takes 0 seconds.
+    """
+    exceeded = []
+    for name, budget in budgets.items():
+        if name == 'total':
+            seconds = report['total_seconds']
+        else:
+            seconds = report['totals'].get(name, {}).get('seconds', 0.0)
+        if seconds > budget:
+            exceeded.append((name, seconds, budget))
+    return exceeded
+
+
+# the profile of this process, started when the app imports this module
+startup_profile = StartupProfile(STARTUP_PROFILE)
@@ -12,3 +12,13 @@ APP_DEBUG = bool(os.environ.get('DEBUG'))
 USE_RELOADER = bool(os.environ.get('USE_RELOADER'))
 DEV_TOOLS_PROPS_CHECK = bool(os.environ.get('DEV_TOOLS_PROPS_CHECK'))
 API_KEY = os.environ.get('API_KEY', None)
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 512 * 1024 ** 2))
+CACHE_SWEEP_INTERVAL = int(os.environ.get('CACHE_SWEEP_INTERVAL', 600))  # seconds
+CACHE_MEMORY_ENTRIES = int(os.environ.get('CACHE_MEMORY_ENTRIES', 256))  # per worker
+CACHE_MEMORY_BYTES = int(os.environ.get('CACHE_MEMORY_BYTES', 64 * 1024 ** 2))  # per worker, JSON size of the entries
+CACHE_STATS = bool(os.environ.get('CACHE_STATS'))  # serve the hit/miss counters at /_cache-stats
+CACHE_COMPRESSION_LEVEL = int(os.environ.get('CACHE_COMPRESSION_LEVEL', 1))  # zlib level of the cached JSON, 0 disables compression
+AIO_RENDER = os.environ.get('AIO_RENDER', 'server')  # 'server' sends plotly figures, 'client' sends aggregates drawn in the browser
+LAZY_PAGES = bool(os.environ.get('LAZY_PAGES'))  # load the data and build the indexes and cubes on first use, not at import
+LAZY_WARM_UP = os.environ.get('LAZY_WARM_UP', '1') != '0'  # with LAZY_PAGES, do it in a background thread once the worker started
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE')  # path of the JSON report of the startup phases, no tracing when unset
@@ -0,0 +1,34 @@
+# package imports
+import pytest
+import dash._callback
+
+# local imports
+import cache
+from components.line_chart_AIO import LineChartAIO
+from components.pie_chart_AIO import PieChartAIO
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    '''A new figure cache, and the charts and callbacks of the test dropped afterwards.'''
+    from cachelib import FileSystemCache
+    monkeypatch.setattr(cache, 'figure_cache', cache.TieredCache(cache.MemoryLRU(64), FileSystemCache(str(tmp_path))))
+    monkeypatch.setattr(LineChartAIO, 'instances', {})
+    monkeypatch.setattr(PieChartAIO, 'instances', {})
+    monkeypatch.setattr(dash._callback, 'GLOBAL_CALLBACK_LIST', [])
+    monkeypatch.setattr(dash._callback, 'GLOBAL_CALLBACK_MAP', {})
+
+
+def registered_callbacks(aio_id, functions=False):
+    '''
+    The server callbacks of a chart, in the order they were registered: output -> function name,
+    or function name -> the function itself (called with the input values, as Dash would) when functions is set.
+    '''
+    callbacks = {
+        output: callback['callback'].__wrapped__
+        for output, callback in dash._callback.GLOBAL_CALLBACK_MAP.items()
+        if f'"aio_id":"{aio_id}"' in output
+    }
+    if functions:
+        return {function.__name__: function for function in callbacks.values()}
+    return {output: function.__name__ for output, function in callbacks.items()}
@@ -0,0 +1,89 @@
+# package imports
+import json
+import numpy
+import pandas
+from dash import dcc
+from plotly.io.json import to_json_plotly
+
+# local imports
+from components.line_chart_AIO import LineChartAIO
+from utils.data_handling import binned_kde, kde_bandwidth
+from tests.components.conftest import registered_callbacks
+
+DROPDOWNS = {
+    'dpurp2': {'label': 'Purpose', 'options': [{'label': 'All', 'value': 'all'}, {'label': 'Work', 'value': 1}, {'label': 'Shop', 'value': 2}]},
+}
+PIVOT_ELEMENTS = {
+    'index': {'attribute': 'RACE', 'labels': {1: 'White', 2: 'Black', 3: 'Asian'}},
+    'column': {'attribute': 'travdist', 'labels': {}},
+}
+
+
+def _trips():
+    return pandas.DataFrame({
+        'dpurp2': numpy.array([1, 1, 1, 2, 2, 2, 1], dtype=numpy.int8),
+        'RACE': numpy.array([1, 1, 2, 1, 2, 3, 3], dtype=numpy.int8),
+        'travdist': numpy.array([1.0, 3.0, 2.0, 4.0, 6.0, 5.0, 7.0], dtype=numpy.float32),
+        'psexpfac': numpy.array([1.0, 3.0, 2.0, 1.0, 1.0, 0.0, 0.0], dtype=numpy.float32),
+    })
+
+
+def _table_rows(table):
+    '''The (category, average) text of the rows of the table of averages.'''
+    body = table['props']['children']['props']['children'][1]
+    return [tuple(cell['props']['children'] for cell in row['props']['children']) for row in body['props']['children']]
+
+
+def test_categories_without_weight_are_left_out():
+    chart = LineChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='zero_weight')
+    # every Asian record weighs 0: no weighted average nor density, and no error
+    assert list(chart.data_processing({'dpurp2': 'all'}, 'RACE', 'travdist')) == [1, 2]
+    graph, table = chart.make_distribution({'dpurp2': 'all'})
+    assert [trace['name'] for trace in graph['props']['figure']['data']] == ['White', 'Black']
+    assert [category for category, _ in _table_rows(table)] == ['White', 'Black']
+
+
+def test_distribution_graph_and_table_of_a_filter():
+    chart = LineChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='distribution')
+    passes = []
+    data_processing = chart.data_processing
+    chart.data_processing = lambda *args: passes.append(args) or data_processing(*args)
+
+    graph, table = chart.make_distribution({'dpurp2': 1})
+    assert len(passes) == 1  # the graph and the table come from one filter/group pass
+    # Work trips: White 1.0 and 3.0 (weights 1 and 3), Black 2.0, the Asian one weighs 0
+    traces = graph['props']['figure']['data']
+    assert [trace['name'] for trace in traces] == ['White', 'Black']
+    white = traces[0]
+    assert (white['x'][0], white['x'][-1], len(white['x'])) == (1.0, 3.0, 200)
+    values, weights = numpy.array([1.0, 3.0]), numpy.array([1.0, 3.0])
+    expected = binned_kde(values, kde_bandwidth(values, weights, bw_adjust=0.3), numpy.array(white['x']), weights)
+    numpy.testing.assert_allclose(white['y'], expected)
+    assert traces[1]['y'] == [0.0] * 200  # a single record has no spread
+    assert _table_rows(table) == [('White', '2.50 (miles)'), ('Black', '2.00 (miles)')]
+
+    # the same JSON as the graph and the table built separately, and cached as one entry
+    groups = data_processing({'dpurp2': 1}, 'RACE', 'travdist')
+    separate = [chart.create_kde_graph(chart.creat_kde_xy(groups)), chart.create_average_table(groups)]
+    assert json.dumps([graph, table]) == json.dumps(json.loads(to_json_plotly(separate)))
+    assert chart.make_distribution({'dpurp2': 1}) == [graph, table]
+    assert len(passes) == 1
+
+
+def test_single_and_store_modes_draw_the_same_outputs():
+    single = LineChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='single')
+    store = LineChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='store', callback_mode='store')
+
+    # single: one callback from the dropdowns to the graph and the table, and no store in the layout
+    callbacks = registered_callbacks('single')
+    assert list(callbacks.values()) == ['update_graph']
+    assert not [component for component in single._traverse() if isinstance(component, dcc.Store)]
+    # store: the dropdowns write the filters to the store, which the second callback reads
+    assert list(registered_callbacks('store').values()) == ['compute_value', 'update_graph']
+    assert [component.id for component in store._traverse() if isinstance(component, dcc.Store)] == [store.store_id]
+
+    for value in ['all', 1, 2]:
+        state = registered_callbacks('store', functions=True)['compute_value'](value)
+        assert state['filters'] == {'dpurp2': value}
+        drawn = registered_callbacks('store', functions=True)['update_graph'](state)
+        assert drawn == registered_callbacks('single', functions=True)['update_graph'](value)
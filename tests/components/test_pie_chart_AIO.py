@@ -0,0 +1,61 @@
+# package imports
+import numpy
+import pandas
+from dash import dcc
+
+# local imports
+from components.pie_chart_AIO import PieChartAIO
+from tests.components.conftest import registered_callbacks
+
+DROPDOWNS = {
+    'dpurp2': {'label': 'Purpose', 'options': [{'label': 'All', 'value': 'all'}, {'label': 'Work', 'value': 1}, {'label': 'Shop', 'value': 2}]},
+}
+PIVOT_ELEMENTS = {
+    'index': {'attribute': 'RACE', 'labels': {1: 'White', 2: 'Black'}},
+    'column': {'attribute': 'tripmode', 'labels': {1: 'Auto', 2: 'Transit', 3: 'Walk'}},
+}
+
+
+def _trips():
+    return pandas.DataFrame({
+        'dpurp2': numpy.array([1, 1, 1, 2, 2, 2, 1], dtype=numpy.int8),
+        'RACE': numpy.array([1, 1, 2, 1, 2, 2, 1], dtype=numpy.int8),
+        'tripmode': numpy.array([1, 2, 1, 3, 2, 1, 1], dtype=numpy.int8),
+        'psexpfac': numpy.array([1.0, 3.0, 2.0, 1.0, 1.0, 4.0, 2.0], dtype=numpy.float32),
+        'lowinc': numpy.array([1, 2, 1, 1, 2, 1, 2], dtype=numpy.int8),
+    })
+
+
+def test_single_and_store_modes_draw_the_same_outputs():
+    single = PieChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='single', render='server')
+    store = PieChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='store', callback_mode='store', render='server')
+
+    # single: one callback from the dropdowns to the charts, and no store in the layout
+    assert list(registered_callbacks('single').values()) == ['update_graph']
+    assert not [component for component in single._traverse() if isinstance(component, dcc.Store)]
+    # store: the dropdowns write the filters to the store, which the second callback reads
+    assert list(registered_callbacks('store').values()) == ['compute_value', 'update_graph']
+    assert [component.id for component in store._traverse() if isinstance(component, dcc.Store)] == [store.store_id]
+
+    for value in ['all', 1, 2]:
+        state = registered_callbacks('store', functions=True)['compute_value'](value)
+        assert state['filters'] == {'dpurp2': value}
+        drawn = registered_callbacks('store', functions=True)['update_graph'](state)
+        assert drawn == registered_callbacks('single', functions=True)['update_graph'](value)
+
+    # Work trips of the White persons: 1 (Auto) + 2 (Auto) and 3 (Transit)
+    charts = registered_callbacks('single', functions=True)['update_graph'](1)['props']['children']
+    white = charts[0]['props']['children']['props']['children']['props']['figure']['data'][0]
+    assert dict(zip(white['labels'], white['values'])) == {'Auto': 3.0, 'Transit': 3.0}
+
+
+def test_filter_index_is_only_built_when_the_cube_does_not_cover_the_filters():
+    chart = PieChartAIO(_trips(), DROPDOWNS, PIVOT_ELEMENTS, aio_id='cube_only', render='server')
+    chart.make_pie_charts({'dpurp2': 1})
+    assert 'cube' in vars(chart)
+    assert 'filter_index' not in vars(chart)  # the cube answers every dropdown combination
+
+    # a filter outside the cube dimensions falls back to filtering the frame
+    table = chart.global_store({'lowinc': 2}, 'RACE', 'tripmode')
+    assert 'filter_index' in vars(chart)
+    assert table.fillna(0).to_dict() == {1: {1: 2.0, 2: 0.0}, 2: {1: 3.0, 2: 1.0}}
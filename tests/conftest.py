@@ -0,0 +1,6 @@
+# the app modules import each other as top-level modules (e.g. `from utils.data_handling import ...`),
+# the same way they are imported when the app runs from the src folder.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,128 @@
+# package imports
+import gzip
+import json
+import brotli
+import pytest
+
+# local imports
+from utils import settings
+
+
+@pytest.fixture(scope='module')
+def client():
+    # lazy pages: the app imports without the data files, which the tests do not have
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(settings, 'LAZY_PAGES', True)
+        import app
+    return app.server.test_client()
+
+
+def _toggle_navbar(client, encoding):
+    '''Calls the navbar callback of the app shell (its output is large enough to be compressed).'''
+    outputs = [
+        {'id': f'vertical-navbar-container_{number}', 'property': name}
+        for number in [1, 2] for name in ['children', 'style']
+    ]
+    body = {
+        'output': '..' + '...'.join(f"{output['id']}.{output['property']}" for output in outputs) + '..',
+        'outputs': outputs,
+        'inputs': [{'id': 'url', 'property': 'pathname', 'value': '/trip_based/page_race'}],
+        'changedPropIds': ['url.pathname'],
+        'state': [],
+    }
+    return client.post('/_dash-update-component', json=body, headers={'Accept-Encoding': encoding})
+
+
+def test_layout_is_served_with_an_etag_and_revalidated(client):
+    import app
+    response = client.get('/_dash-layout')
+    assert response.status_code == 200
+    assert response.data == app.layout_json
+    etag = response.headers['ETag']
+    assert etag.strip('"').split(':')[0] == app.layout_etag
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    revalidated = client.get('/_dash-layout', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+
+def test_callback_responses_are_compressed_with_brotli_or_gzip(client):
+    plain = _toggle_navbar(client, '')
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert 'vertical-navbar-container_2' in json.loads(plain.data)['response']
+
+    preferred = _toggle_navbar(client, 'gzip, deflate, br')
+    assert preferred.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(preferred.data) == plain.data
+
+    fallback = _toggle_navbar(client, 'gzip')
+    assert fallback.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(fallback.data) == plain.data
+
+
+def test_fingerprinted_assets_are_immutable(client):
+    response = client.get('/assets/clientside.js?m=1700000000.0')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+
+def test_other_assets_are_revalidated_with_their_etag(client):
+    response = client.get('/assets/clientside.js', headers={'Accept-Encoding': 'br'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.headers['Content-Encoding'] == 'br'
+    etag = response.headers['ETag']
+    assert etag.endswith(':br"')  # Flask-Compress appends the encoding
+
+    # the encoding suffix is ignored when the ETags are compared, whichever encoding the browser accepts now
+    for encoding in ['br', 'gzip', '']:
+        revalidated = client.get('/assets/clientside.js', headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+        assert revalidated.status_code == 304
+        assert revalidated.data == b''
+
+    changed = client.get('/assets/clientside.js', headers={'If-None-Match': '"another-version"'})
+    assert changed.status_code == 200
+    assert changed.data == client.get('/assets/clientside.js').data
+
+
+def _image_sources(component):
+    '''The src of every html.Img of a serialized layout.'''
+    if isinstance(component, list):
+        return [src for child in component for src in _image_sources(child)]
+    if not isinstance(component, dict):
+        return []
+    props = component.get('props', {})
+    sources = [props['src']] if component.get('type') == 'Img' else []
+    return sources + _image_sources(props.get('children'))
+
+
+def test_unknown_images_are_not_found(client):
+    assert client.get('/_images/missing.png').status_code == 404
+
+
+def test_images_are_immutable_only_with_their_fingerprint(client):
+    from utils.images import image_url, images
+    content, mimetype, fingerprint = images['1a_ColorPrimarySmall.png']
+
+    response = client.get(image_url('1a_ColorPrimarySmall.png'))
+    assert response.status_code == 200
+    assert response.data == content
+    assert response.mimetype == mimetype
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    for url in ['/_images/1a_ColorPrimarySmall.png', '/_images/1a_ColorPrimarySmall.png?v=outdated']:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert response.headers['ETag'] == f'"{fingerprint}"'
+
+
+def test_navbar_links_the_logos_instead_of_embedding_them(client):
+    import app
+    from utils.images import image_url
+    sources = _image_sources(json.loads(app.layout_json))
+    assert image_url('1a_ColorPrimarySmall.png') in sources
+    assert image_url('dvrpc_equity_dash_logo.svg') in sources
+    assert not [src for src in sources if src.startswith('data:')]
@@ -0,0 +1,77 @@
+# package imports
+import os
+from cachelib import SimpleCache
+
+# local imports
+from cache import MemoryLRU, TieredCache, sweep_cache
+
+
+def _write(path, size, mtime):
+    with open(path, 'wb') as cache_file:
+        cache_file.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_sweep_cache_keeps_only_the_current_namespace(tmp_path):
+    current = tmp_path / 'trip-new_tour-new'
+    old = tmp_path / 'trip-old_tour-old'
+    current.mkdir()
+    old.mkdir()
+    _write(current / 'entry', 10, 1000)
+    _write(old / 'entry', 10, 1000)
+    _write(tmp_path / 'entry-without-namespace', 10, 1000)
+
+    sweep_cache(root=str(tmp_path), current=str(current), max_bytes=1024)
+    assert sorted(os.listdir(tmp_path)) == ['trip-new_tour-new']
+    assert os.listdir(current) == ['entry']
+
+
+def test_sweep_cache_deletes_the_oldest_entries_over_max_bytes(tmp_path):
+    current = tmp_path / 'namespace'
+    current.mkdir()
+    for name, mtime in [('oldest', 1000), ('middle', 2000), ('newest', 3000)]:
+        _write(current / name, 100, mtime)
+    _write(current / '__wz_cache_count', 4, 500)  # the entry counter of cachelib is never deleted
+
+    sweep_cache(root=str(tmp_path), current=str(current), max_bytes=250)
+    assert sorted(os.listdir(current)) == ['__wz_cache_count', 'middle', 'newest']
+
+    sweep_cache(root=str(tmp_path), current=str(current), max_bytes=1000)
+    assert sorted(os.listdir(current)) == ['__wz_cache_count', 'middle', 'newest']
+
+
+def test_memory_lru_evicts_the_least_recently_used_entry():
+    lru = MemoryLRU(max_entries=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1  # 'b' is now the least recently used
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+
+
+def test_memory_lru_byte_limit():
+    lru = MemoryLRU(max_entries=10, max_bytes=100)
+    lru.set('a', 1, size=40)
+    lru.set('b', 2, size=40)
+    lru.set('a', 1, size=50)  # replacing an entry updates the size
+    assert lru.nbytes == 90
+    lru.set('c', 3, size=30)  # over the limit, 'b' is the least recently used
+    assert (lru.get('a'), lru.get('b'), lru.get('c')) == (1, None, 3)
+    assert lru.nbytes == 80
+    lru.set('d', 4, size=101)  # larger than the whole tier
+    assert lru.get('d') is None and lru.nbytes == 80
+
+
+def test_tiered_cache_promotes_shared_hits_into_memory():
+    shared = SimpleCache()
+    writer = TieredCache(MemoryLRU(10), shared)  # another worker
+    reader = TieredCache(MemoryLRU(10, max_bytes=1024), shared)
+    value = {'type': 'Div', 'props': {'children': [1.5, 'x']}}
+
+    assert writer.set('key', value) == value
+    assert reader.get('key') == value  # from the shared tier, then kept in memory
+    assert reader.memory.get('key') == value and reader.memory.nbytes > 0
+    assert reader.get('key') == value
+    assert reader.get('missing') is None
+    assert reader.stats() == {'memory': {'hits': 1, 'misses': 2}, 'filesystem': {'hits': 1, 'misses': 1}}
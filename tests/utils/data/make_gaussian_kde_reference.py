@@ -0,0 +1,48 @@
+# notes
+'''
+Writes gaussian_kde_reference.json: densities of scipy.stats.gaussian_kde (silverman bandwidth times 0.3,
+as the line charts), with and without weights, that the NumPy KDE tests compare against without scipy.
+Only needed again when the reference cases change:
+    pip install scipy && python tests/utils/data/make_gaussian_kde_reference.py
+'''
+
+# package imports
+import json
+import os
+import numpy
+import scipy
+import scipy.stats
+
+BW_ADJUST = 0.3
+
+
+def case(values, weights, n_points=100):
+    x = numpy.linspace(values.min(), values.max(), n_points)
+    kde = scipy.stats.gaussian_kde(values, bw_method='silverman', weights=weights)
+    kde.set_bandwidth(bw_method=kde.factor * BW_ADJUST)
+    return {
+        'values': values.tolist(),
+        'weights': None if weights is None else weights.tolist(),
+        'x': x.tolist(),
+        'bandwidth': float(numpy.sqrt(kde.covariance[0, 0])),
+        'density': kde(x).tolist(),
+    }
+
+
+def main():
+    rng = numpy.random.default_rng(4)
+    gamma = numpy.round(rng.gamma(2.0, 3.0, 400), 3)  # trip distances
+    lognormal = numpy.round(rng.lognormal(1.0, 0.8, 400), 3)  # trip durations
+    weights = numpy.round(rng.random(400) * 100, 2)  # person weights
+    reference = {
+        'scipy': scipy.__version__,
+        'bw_adjust': BW_ADJUST,
+        'cases': [case(gamma, None), case(gamma, weights), case(lognormal, None), case(lognormal, weights)],
+    }
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gaussian_kde_reference.json')
+    with open(path, 'w') as reference_file:
+        json.dump(reference, reference_file)
+
+
+if __name__ == '__main__':
+    main()
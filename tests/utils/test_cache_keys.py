@@ -0,0 +1,96 @@
+# package imports
+import multiprocessing
+import os
+import pytest
+
+# local imports
+from utils.cache_keys import code_version, make_cache_key
+
+PIVOT = {'index': 'RACE', 'column': 'tripmode'}
+
+
+def _worker(cache_dir, filters, results):
+    '''Looks up (and on a miss stores) a chart the way a gunicorn worker would, in its own process.'''
+    from cachelib import FileSystemCache
+    cache = FileSystemCache(cache_dir)
+    key = make_cache_key('PieChartAIO', 'race_mode_share_trip', 'make_pie_charts', filters, PIVOT, 'v1', 'c1')
+    hit = cache.get(key) is not None
+    if not hit:
+        cache.set(key, 'figure')
+    results.put((key, hit))
+
+
+
+def _memoized_worker(cache_dir, filters, results):
+    '''Draws a chart through memoize_aio, in its own process, with the figure cache in cache_dir.'''
+    import cache
+    from cachelib import FileSystemCache
+    from cache import memoize_aio
+
+    class PieChartAIO:
+        aio_id = 'race_mode_share_trip'
+        pivot_spec = PIVOT
+        dataset_version = 'v1'
+
+        @memoize_aio
+        def make_pie_charts(self, filters):
+            return {'drawn_by': os.getpid()}
+
+    cache.figure_cache = cache.TieredCache(cache.MemoryLRU(8), FileSystemCache(cache_dir))
+    results.put(PieChartAIO().make_pie_charts(filters)['drawn_by'])
+
+def test_key_ignores_filter_order():
+    first = make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'dpurp2': 1, 'ocounty': 'all'}, PIVOT, 'v1', 'c1')
+    second = make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'ocounty': 'all', 'dpurp2': 1}, PIVOT, 'v1', 'c1')
+    assert first == second
+
+
+def test_key_changes_with_every_part():
+    key = make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'dpurp2': 1}, PIVOT, 'v1', 'c1')
+    assert key != make_cache_key('LineChartAIO', 'a', 'make_pie_charts', {'dpurp2': 1}, PIVOT, 'v1', 'c1')
+    assert key != make_cache_key('PieChartAIO', 'b', 'make_pie_charts', {'dpurp2': 1}, PIVOT, 'v1', 'c1')
+    assert key != make_cache_key('PieChartAIO', 'a', 'make_table', {'dpurp2': 1}, PIVOT, 'v1', 'c1')
+    assert key != make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'dpurp2': 2}, PIVOT, 'v1', 'c1')
+    assert key != make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'dpurp2': 1}, {'index': 'HISP_B', 'column': 'tripmode'}, 'v1', 'c1')
+    assert key != make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'dpurp2': 1}, PIVOT, 'v2', 'c1')
+    assert key != make_cache_key('PieChartAIO', 'a', 'make_pie_charts', {'dpurp2': 1}, PIVOT, 'v1', 'c2')
+
+
+def test_two_worker_processes_share_the_cache_entry(tmp_path):
+    pytest.importorskip('cachelib')
+    # spawned processes get their own hash seed, like separate workers or a restarted app
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    for filters in [{'dpurp2': 1, 'ocounty': 'all', 'lowinc': 2}, {'lowinc': 2, 'ocounty': 'all', 'dpurp2': 1}]:
+        worker = context.Process(target=_worker, args=(str(tmp_path), filters, results))
+        worker.start()
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    (first_key, first_hit), (second_key, second_hit) = results.get(timeout=5), results.get(timeout=5)
+    assert first_key == second_key
+    assert not first_hit and second_hit
+
+
+def test_memoize_aio_shares_the_entry_between_worker_processes(tmp_path):
+    pytest.importorskip('cachelib')
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    pids = []
+    for filters in [{'dpurp2': 1, 'ocounty': 'all'}, {'ocounty': 'all', 'dpurp2': 1}]:
+        worker = context.Process(target=_memoized_worker, args=(str(tmp_path), filters, results))
+        worker.start()
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+        pids.append(worker.pid)
+    # the second worker got the chart drawn by the first one
+    assert [results.get(timeout=5), results.get(timeout=5)] == [pids[0], pids[0]]
+
+
+def test_code_version_follows_the_source(tmp_path):
+    source = tmp_path / 'pie_chart_AIO.py'
+    source.write_text('def draw(): return 1\n')
+    version = code_version([str(source)], extra=['5.6.0'])
+    assert version == code_version([str(source)], extra=['5.6.0'])
+    assert version != code_version([str(source)], extra=['5.7.0'])
+    source.write_text('def draw(): return 2\n')
+    assert version != code_version([str(source)], extra=['5.6.0'])
@@ -0,0 +1,51 @@
+# package imports
+import numpy
+import pandas
+
+# local imports
+from utils.data_cube import WeightedCube
+from utils.data_handling import cross_tab, filter_df
+
+
+def _survey(n=2000):
+    rng = numpy.random.default_rng(2)
+    return pandas.DataFrame({
+        'dpurp2': rng.integers(1, 4, n),
+        'ocounty': rng.integers(1, 9, n),
+        'RACE': rng.integers(1, 5, n),
+        'tripmode': rng.choice([1, 2, 3, 5, 6, 7, 8], n),
+        'psexpfac': rng.gamma(2.0, 50.0, n),
+    })
+
+
+def test_cube_cross_tab_matches_filtered_cross_tab():
+    df = _survey()
+    cube = WeightedCube(df, ['dpurp2', 'ocounty', 'RACE', 'tripmode'])
+    for conditions in [{}, {'dpurp2': 2}, {'dpurp2': 1, 'ocounty': [3, 5]}, {'ocounty': 9}]:
+        expected = cross_tab(filter_df(df, conditions), 'RACE', 'tripmode')
+        result = cube.cross_tab(conditions, 'RACE', 'tripmode')
+        pandas.testing.assert_frame_equal(result, expected, check_dtype=False, check_index_type=False, check_column_type=False)
+    # the axes can be requested in either order
+    transposed = cube.cross_tab({'dpurp2': 3}, 'tripmode', 'RACE')
+    expected = cross_tab(filter_df(df, {'dpurp2': 3}), 'tripmode', 'RACE')
+    pandas.testing.assert_frame_equal(transposed, expected, check_dtype=False, check_index_type=False, check_column_type=False)
+
+
+def test_cube_covers_only_its_dimensions():
+    cube = WeightedCube(_survey(), ['dpurp2', 'RACE', 'tripmode'])
+    assert cube.covers({'dpurp2': 1}, 'RACE', 'tripmode')
+    assert not cube.covers({'ocounty': 1}, 'RACE', 'tripmode')
+
+
+def test_cube_to_dict_flattens_cells_in_row_major_order():
+    df = _survey()
+    cube = WeightedCube(df, ['dpurp2', 'RACE', 'tripmode'])
+    data = cube.to_dict()
+    assert data['dimensions'] == ['dpurp2', 'RACE', 'tripmode']
+    assert data['levels'][2] == [1, 2, 3, 5, 6, 7, 8]
+    shape = tuple(len(levels) for levels in data['levels'])
+    assert 'counts' not in data  # the record counts are not sent to the browser
+    present = numpy.array(data['present']).reshape(shape)
+    assert present.dtype == bool
+    numpy.testing.assert_array_equal(present, cube.counts > 0)
+    numpy.testing.assert_allclose(numpy.array(data['weights']).reshape(shape), cube.weights, rtol=1e-5)
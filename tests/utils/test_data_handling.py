@@ -0,0 +1,144 @@
+# package imports
+import json
+import os
+import numpy
+import pandas
+import pytest
+
+# local imports
+from utils.data_handling import (
+    binned_kde, cross_tab, exact_kde, factorize, filter_df, group_arrays, group_to_dict, kde_bandwidth, round_significant,
+)
+
+
+def _survey():
+    return pandas.DataFrame({
+        'ocounty': [1, 1, 2, 5, 5],
+        'tourmode2': [3, 1, 3, 3, 2],
+        'RACE': [1, 2, 3, 4, 1],
+        'psexpfac': [10.0, 20.0, 30.0, 40.0, 50.0],
+    })
+
+
+def _gaussian_kde_reference():
+    '''Densities of scipy.stats.gaussian_kde, see data/make_gaussian_kde_reference.py.'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gaussian_kde_reference.json')
+    with open(path) as reference_file:
+        return json.load(reference_file)
+
+
+def test_filter_df_combines_conditions_and_projects_columns():
+    filtered = filter_df(_survey(), {'ocounty': [1, 5], 'tourmode2': 3}, columns=['RACE'])
+    assert list(filtered.columns) == ['RACE']
+    assert filtered['RACE'].tolist() == [1, 4]
+
+
+def test_filter_df_without_conditions_returns_all_rows():
+    df = _survey()
+    filtered = filter_df(df, {})
+    assert filtered.equals(df)
+
+
+def test_factorize_small_integers_and_fallback():
+    levels, codes = factorize(numpy.array([5, 1, 5, 3], dtype=numpy.int8))
+    assert levels.tolist() == [1, 3, 5] and codes.tolist() == [2, 0, 2, 1]
+    levels, codes = factorize(numpy.array([5, 1, 5], dtype=numpy.int8), dense=True)
+    assert levels.tolist() == [1, 2, 3, 4, 5] and codes.tolist() == [4, 0, 4]
+    levels, codes = factorize(numpy.array([2.5, 0.5, 2.5]))
+    assert levels.tolist() == [0.5, 2.5] and codes.tolist() == [1, 0, 1]
+
+
+def test_cross_tab_matches_pivot_table():
+    rng = numpy.random.default_rng(3)
+    df = pandas.DataFrame({
+        'RACE': rng.integers(1, 5, 500),
+        'tripmode': rng.choice([1, 2, 3, 5, 6, 7, 8], 500),
+        'psexpfac': rng.gamma(2.0, 50.0, 500),
+    })
+    expected = pandas.pivot_table(df, values='psexpfac', index='RACE', columns='tripmode', aggfunc='sum', fill_value=0)
+    pandas.testing.assert_frame_equal(cross_tab(df, 'RACE', 'tripmode'), expected, check_dtype=False, check_index_type=False, check_column_type=False)
+
+
+def test_kde_matches_the_gaussian_kde_reference():
+    reference = _gaussian_kde_reference()
+    for case in reference['cases']:
+        values, x, expected = (numpy.array(case[name]) for name in ['values', 'x', 'density'])
+        weights = None if case['weights'] is None else numpy.array(case['weights'])
+        bandwidth = kde_bandwidth(values, weights, bw_method='silverman', bw_adjust=reference['bw_adjust'])
+        assert bandwidth == pytest.approx(case['bandwidth'], rel=1e-12)
+        numpy.testing.assert_allclose(exact_kde(values, bandwidth, x, weights, chunk_size=128), expected, rtol=1e-9, atol=1e-12)
+        numpy.testing.assert_allclose(binned_kde(values, bandwidth, x, weights), expected, atol=1e-3 * expected.max())
+
+
+def test_binned_kde_matches_scipy_gaussian_kde():
+    stats = pytest.importorskip('scipy.stats')
+    rng = numpy.random.default_rng(4)
+    values = rng.gamma(2.0, 3.0, 5000)
+    weights = rng.random(5000)
+    x = numpy.linspace(values.min(), values.max(), 200)
+    for sample_weights in [None, weights]:
+        kde = stats.gaussian_kde(values, bw_method='silverman', weights=sample_weights)
+        kde.set_bandwidth(bw_method=kde.factor * 0.3)
+        expected = kde(x)
+        bandwidth = kde_bandwidth(values, sample_weights, bw_method='silverman', bw_adjust=0.3)
+        assert bandwidth == pytest.approx(numpy.sqrt(kde.covariance[0, 0]))
+        numpy.testing.assert_allclose(binned_kde(values, bandwidth, x, sample_weights), expected, atol=1e-3 * expected.max())
+
+
+def test_exact_kde_matches_scipy_gaussian_kde():
+    stats = pytest.importorskip('scipy.stats')
+    rng = numpy.random.default_rng(5)
+    values = rng.lognormal(1.0, 0.8, 3000)
+    weights = rng.random(3000)
+    x = numpy.linspace(values.min(), values.max(), 200)
+    for sample_weights in [None, weights]:
+        kde = stats.gaussian_kde(values, bw_method='silverman', weights=sample_weights)
+        kde.set_bandwidth(bw_method=kde.factor * 0.3)
+        bandwidth = kde_bandwidth(values, sample_weights, bw_method='silverman', bw_adjust=0.3)
+        numpy.testing.assert_allclose(exact_kde(values, bandwidth, x, sample_weights, chunk_size=1000), kde(x), rtol=1e-9, atol=1e-12)
+
+
+def test_exact_kde_of_a_constant_sample_is_zero():
+    assert exact_kde(numpy.full(10, 2.0), 0.0, numpy.linspace(0, 4, 5)).tolist() == [0.0] * 5
+
+
+@pytest.mark.filterwarnings('error')
+def test_kde_bandwidth_of_a_degenerate_group_is_zero():
+    assert kde_bandwidth(numpy.array([3.0])) == 0.0
+    assert kde_bandwidth(numpy.array([3.0, 5.0]), numpy.array([1.0, 0.0])) == 0.0  # one effective sample
+    assert kde_bandwidth(numpy.full(4, 2.0), numpy.ones(4)) == 0.0
+    x = numpy.linspace(3.0, 3.0, 5)
+    assert binned_kde(numpy.array([3.0]), 0.0, x).tolist() == [0.0] * 5
+
+
+@pytest.mark.filterwarnings('error')
+def test_kde_of_a_group_without_weight_is_zero():
+    values, weights = numpy.array([1.0, 2.0, 4.0]), numpy.zeros(3)
+    assert kde_bandwidth(values, weights) == 0.0
+    x = numpy.linspace(1.0, 4.0, 5)
+    assert binned_kde(values, 0.5, x, weights).tolist() == [0.0] * 5
+    assert exact_kde(values, 0.5, x, weights).tolist() == [0.0] * 5
+
+
+def test_group_arrays_splits_columns_per_group():
+    keys = numpy.array([2, 1, 2, 3, 1], dtype=numpy.int8)
+    groups = group_arrays(keys, numpy.array([10., 20., 30., 40., 50.]), numpy.array([1, 2, 3, 4, 5]))
+    assert list(groups) == [1, 2, 3]
+    assert groups[1][0].tolist() == [20., 50.] and groups[1][1].tolist() == [2, 5]
+    assert groups[2][0].tolist() == [10., 30.]
+    assert group_arrays(numpy.array([], dtype=numpy.int8), numpy.array([])) == {}
+
+
+def test_group_to_dict_returns_arrays():
+    df = pandas.DataFrame({'A': [1, 1, 2], 'B': ['x', 'y', 'z']})
+    groups = group_to_dict(df, 'A', 'B')
+    assert list(groups) == [1, 2]
+    assert isinstance(groups[1], numpy.ndarray) and groups[1].tolist() == ['x', 'y']
+
+
+def test_round_significant_is_relative_to_the_largest_value():
+    rounded = round_significant(numpy.array([123.456789, 0.0123456, -7.77777]), 4)
+    assert rounded.tolist() == [123.5, 0.0, -7.8]
+    assert round_significant(numpy.array([0.00123456, 0.00000123]), 3).tolist() == [0.00123, 0.0]
+    assert round_significant(numpy.zeros(3)).tolist() == [0.0, 0.0, 0.0]
+    assert round_significant(numpy.array([])).tolist() == []
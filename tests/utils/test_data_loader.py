@@ -0,0 +1,112 @@
+# package imports
+import json
+import multiprocessing
+import os
+import numpy
+import pandas
+import pytest
+
+# local imports
+from utils.data_loader import compact_dtypes, dataset_version, lazy_loader, load_column_store, store_path, MANIFEST_NAME
+
+
+def _prepare(df):
+    return df[df['tripmode'] != 0]
+
+
+def _cold_load(data_path, barrier, results):
+    '''A worker loading the store after a data refresh, at the same time as the others.'''
+    barrier.wait()
+    try:
+        results.put(load_column_store(data_path, ['tripmode', 'RACE'], _prepare)['RACE'].tolist())
+    except Exception as error:
+        results.put(repr(error))
+
+
+def test_compact_dtypes_casts_codes_and_reports_savings():
+    df = pandas.DataFrame({'RACE': [1, 2, 4], 'psexpfac': [1.5, 2.5, 3.5], 'other': [1, 2, 3]})
+    compacted, bytes_saved = compact_dtypes(df)
+    assert compacted['RACE'].dtype == numpy.int8
+    assert compacted['psexpfac'].dtype == numpy.float32
+    assert compacted['other'].dtype == numpy.int64
+    assert bytes_saved == 3 * 7 + 3 * 4
+    assert compacted['RACE'].tolist() == [1, 2, 4]
+
+
+def test_compact_dtypes_keeps_values_that_do_not_fit():
+    df = pandas.DataFrame({'RACE': [1, 300], 'lowinc': [1.0, numpy.nan]})
+    compacted, bytes_saved = compact_dtypes(df)
+    assert compacted['RACE'].dtype == numpy.int64
+    assert compacted['lowinc'].dtype == numpy.float64
+    assert bytes_saved == 0
+
+
+def test_load_column_store_reads_only_requested_columns(tmp_path):
+    data_path = str(tmp_path / 'trip.pkl')
+    pandas.DataFrame({'tripmode': [0, 1, 2], 'RACE': [1, 2, 3], 'unused': [7, 8, 9]}).to_pickle(data_path)
+
+    df = load_column_store(data_path, ['tripmode', 'RACE'], _prepare)
+    assert list(df.columns) == ['tripmode', 'RACE']
+    assert df['RACE'].tolist() == [2, 3]
+    assert not df['RACE'].to_numpy().flags.writeable  # memory-mapped, read-only
+
+    # the store is rebuilt once the pickle changes
+    pandas.DataFrame({'tripmode': [1, 1], 'RACE': [4, 4], 'unused': [0, 0]}).to_pickle(data_path)
+    assert load_column_store(data_path, ['tripmode', 'RACE'], _prepare)['RACE'].tolist() == [4, 4]
+
+
+def test_concurrent_workers_build_the_store_once(tmp_path):
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        pytest.skip('fork is not available')
+    data_path = str(tmp_path / 'trip.pkl')
+    pandas.DataFrame({'tripmode': [0, 1, 2] * 1000, 'RACE': [1, 2, 3] * 1000}).to_pickle(data_path)
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(4)
+    results = context.Queue()
+    workers = [context.Process(target=_cold_load, args=(data_path, barrier, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+    assert outcomes == [[2, 3] * 1000] * 4
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.building_')]
+
+
+def test_column_subsets_share_the_full_store(tmp_path):
+    data_path = str(tmp_path / 'trip.pkl')
+    pandas.DataFrame({'tripmode': [0, 1, 2], 'RACE': [1, 2, 3], 'lowinc': [0, 1, 0], 'unused': [7, 8, 9]}).to_pickle(data_path)
+    manifest_path = os.path.join(store_path(data_path), MANIFEST_NAME)
+
+    # the pre-processing needs tripmode, which is not requested
+    assert load_column_store(data_path, ['RACE'], _prepare)['RACE'].tolist() == [2, 3]
+    with open(manifest_path) as manifest_file:
+        assert json.load(manifest_file)['columns'] == ['RACE', 'tripmode', 'lowinc']
+    built = os.stat(manifest_path).st_mtime_ns
+
+    # another subset is read from the same store, without a rebuild
+    assert load_column_store(data_path, ['lowinc', 'tripmode'], _prepare)['lowinc'].tolist() == [1, 0]
+    assert os.stat(manifest_path).st_mtime_ns == built
+
+    # a column outside the schema is added to the store
+    df = load_column_store(data_path, ['unused'], _prepare)
+    assert df['unused'].tolist() == [8, 9]
+    with open(manifest_path) as manifest_file:
+        assert json.load(manifest_file)['columns'] == ['RACE', 'tripmode', 'lowinc', 'unused']
+
+
+def test_lazy_loader_loads_once_on_first_call(tmp_path):
+    data_path = str(tmp_path / 'trip.pkl')
+    pandas.DataFrame({'tripmode': [0, 1, 2], 'RACE': [1, 2, 3]}).to_pickle(data_path)
+    calls = []
+
+    def get_data():
+        calls.append(1)
+        return load_column_store(data_path, ['tripmode', 'RACE'], _prepare)
+
+    load = lazy_loader(get_data, data_path)
+    assert load.dataset_version == dataset_version(data_path)
+    assert calls == []  # nothing is read until the data is needed
+    assert load() is load()
+    assert calls == [1]
+    assert load().attrs['dataset_version'] == load.dataset_version
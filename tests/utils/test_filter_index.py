@@ -0,0 +1,46 @@
+# package imports
+import gc
+import numpy
+import pandas
+
+# local imports
+from utils.data_handling import filter_df, filter_mask
+from utils.filter_index import FilterIndex, get_filter_index, _INDEXES
+
+
+def _survey(n=1003):
+    rng = numpy.random.default_rng(1)
+    return pandas.DataFrame({
+        'ocounty': rng.integers(1, 9, n).astype(numpy.int8),
+        'lowinc': rng.integers(1, 4, n).astype(numpy.int8),
+        'psexpfac': rng.random(n),
+    })
+
+
+def test_index_mask_matches_scan():
+    df = _survey()
+    index = FilterIndex(df, ['ocounty', 'lowinc'])
+    for conditions in [{}, {'ocounty': 5}, {'ocounty': [1, 2], 'lowinc': 3}, {'ocounty': 42}]:
+        assert numpy.array_equal(index.mask(conditions), filter_mask(df, conditions))
+    assert index.nbytes == (8 + 3) * ((len(df) + 7) // 8)
+
+
+def test_filter_df_uses_index_only_when_it_covers_the_conditions():
+    df = _survey()
+    index = get_filter_index(df)
+    index.add_columns(['ocounty'])
+    assert get_filter_index(df) is index
+    assert index.covers({'ocounty': 1}) and not index.covers({'lowinc': 1})
+    for conditions in [{'ocounty': 3}, {'ocounty': 3, 'lowinc': 2}]:
+        assert filter_df(df, conditions, index=index).equals(filter_df(df, conditions))
+
+
+def test_index_is_dropped_with_its_dataframe():
+    df = _survey()
+    index = get_filter_index(df)
+    frame_id = id(df)
+    assert _INDEXES[frame_id] is index
+    del df
+    gc.collect()
+    assert frame_id not in _INDEXES
+    assert index.df is None
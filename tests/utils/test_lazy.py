@@ -0,0 +1,35 @@
+# package imports
+import threading
+import time
+
+# local imports
+from utils.lazy import locked_cached_property
+
+
+class Chart:
+    def __init__(self):
+        self.builds = []
+
+    @locked_cached_property
+    def df(self):
+        self.builds.append('df')
+        time.sleep(0.05)  # long enough for the other threads to ask for it in the meantime
+        return [1, 2, 3]
+
+    @locked_cached_property
+    def cube(self):
+        self.builds.append('cube')
+        return sum(self.df)  # a property using another one holds the (re-entrant) lock
+
+
+def test_value_is_built_once_by_concurrent_threads():
+    chart = Chart()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(chart.cube)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [6] * 8
+    assert chart.builds == ['cube', 'df']
+    assert chart.df is chart.df
@@ -0,0 +1,41 @@
+# package imports
+import json
+
+# local imports
+from utils.profiling import StartupProfile, check_budgets
+
+
+def test_phases_are_nested_and_totalled(tmp_path):
+    profile = StartupProfile(str(tmp_path / 'startup.json'))
+
+    @profile.timed('construction')
+    def construct():
+        with profile.phase('callback registration'):
+            return [0] * 1000
+
+    with profile.phase('page import'):
+        construct()
+        construct()
+
+    report = profile.finish()
+    assert [(record['name'], record['depth']) for record in report['phases']] == [
+        ('page import', 0), ('construction', 1), ('callback registration', 2),
+        ('construction', 1), ('callback registration', 2),
+    ]
+    assert report['totals']['construction']['count'] == 2
+    assert report['totals']['page import']['seconds'] >= report['totals']['construction']['seconds']
+    assert json.loads((tmp_path / 'startup.json').read_text())['totals'] == report['totals']
+
+
+def test_disabled_profile_records_nothing():
+    profile = StartupProfile(None)
+    with profile.phase('imports'):
+        pass
+    assert profile.phases == []
+    assert profile.finish() is None
+
+
+def test_check_budgets():
+    report = {'total_seconds': 3.0, 'totals': {'imports': {'seconds': 2.5}, 'get_trip_data': {'seconds': 0.2}}}
+    assert check_budgets(report, {'total': 5, 'imports': 3, 'get_tour_data': 1}) == []
+    assert check_budgets(report, {'total': 2, 'get_trip_data': 0.1}) == [('total', 3.0, 2), ('get_trip_data', 0.2, 0.1)]